@@ -0,0 +1,78 @@
+'''JSON API против HTML: постов в секунду на одной и той же странице.
+
+Заполняет временную базу SQLite через seed_bench и запрашивает первую
+страницу ленты в HTML (posts:...) и в JSON (api:...) с выключенным
+кешем, чтобы сравнивать саму выборку и сериализацию с рендером.
+
+    python benchmarks/api.py --posts 20000 --requests 100
+'''
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from utils import report, setup_django
+
+
+def measure(client, url, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(timings), len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = os.path.join(scratch.name, 'db.sqlite3')
+    setup_django()
+    from django.core.management import call_command
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from posts.models import Group, UserStats
+    from posts.views import NUM_POSTS_NEED
+
+    override_settings(
+        ALLOWED_HOSTS=['*'],
+        MEDIA_ROOT=os.path.join(scratch.name, 'media'),
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    ).enable()
+    call_command('migrate', verbosity=0)
+    call_command('seed_bench', posts=args.posts, users=200,
+                 comments=args.posts, stdout=io.StringIO())
+    author = UserStats.objects.order_by('-posts_count').first().user
+    group = Group.objects.first()
+    pages = {
+        'index': {},
+        'group_list': {'slug': group.slug},
+        'profile': {'username': author.username},
+    }
+    client = Client()
+    results = {}
+    for page, kwargs in pages.items():
+        html_seconds, html_bytes = measure(
+            client, reverse(f'posts:{page}', kwargs=kwargs), args.requests)
+        api_seconds, api_bytes = measure(
+            client, reverse(f'api:{page}', kwargs=kwargs), args.requests)
+        results[page] = {
+            'html_posts_per_second': round(NUM_POSTS_NEED / html_seconds),
+            'api_posts_per_second': round(NUM_POSTS_NEED / api_seconds),
+            'html_bytes': html_bytes,
+            'api_bytes': api_bytes,
+        }
+    report('api', {'posts': args.posts, 'pages': results})
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
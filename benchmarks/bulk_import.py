@@ -0,0 +1,76 @@
+'''Скорость bulk_import против сохранения через PostForm.
+
+Пишет NDJSON с постами во временный файл и импортирует его во
+временную базу SQLite; для сравнения первые --form-rows строк
+сохраняются по одной через PostForm, как это делал бы перенос через
+формы.
+
+    python benchmarks/bulk_import.py --rows 1000000
+'''
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from utils import report, setup_django
+
+
+def write_posts(path, rows):
+    with open(path, 'w', encoding='utf-8') as output:
+        for number in range(1, rows + 1):
+            output.write(json.dumps({
+                'text': f'Пост номер {number} из старого сообщества',
+                'author': f'user{number % 100}',
+                'group': 'old' if number % 3 else '',
+                'pub_date': '2019-05-01T12:00:00+00:00',
+            }, ensure_ascii=False) + '\n')
+
+
+def form_rate(rows):
+    from django.contrib.auth import get_user_model
+    from posts.forms import PostForm
+
+    author = get_user_model().objects.get(username='user0')
+    started = time.perf_counter()
+    for number in range(rows):
+        form = PostForm({'text': f'Пост через форму {number}'})
+        post = form.save(commit=False)
+        post.author = author
+        post.save()
+    return round(rows / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--form-rows', type=int, default=1000)
+    args = parser.parse_args()
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = os.path.join(scratch.name, 'db.sqlite3')
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from posts import importing
+    from posts.models import Group
+
+    call_command('migrate', verbosity=0)
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(username=f'user{number}', password='!')
+        for number in range(100))
+    Group.objects.create(title='Старая группа', slug='old')
+    path = os.path.join(scratch.name, 'posts.ndjson')
+    write_posts(path, args.rows)
+    summary = importing.Importer('posts').run(importing.read(path))
+    report('bulk_import', {
+        'rows': args.rows,
+        'bulk_import_rows_per_second': summary['rows_per_second'],
+        'post_form_rows_per_second': form_rate(args.form_rows),
+    })
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
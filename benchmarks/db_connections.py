@@ -0,0 +1,80 @@
+'''Соединения с базой на запросы: CONN_MAX_AGE = 0 против постоянных.
+
+Гоняет запросы через WSGIHandler, как сервер, - с сигналами начала и
+конца запроса, на которых Django закрывает соединения, - и считает
+открытые соединения счётчиком core.db. По умолчанию база - временная
+SQLite: соединение с ней почти бесплатно, поэтому здесь важен счёт, а
+не время. С DB_ENGINE=django.db.backends.postgresql и настройками
+PostgreSQL из окружения меряется и время рукопожатия; с DB_POOL_SIZE
+добавляется режим пула.
+
+    python benchmarks/db_connections.py --requests 500
+'''
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from utils import report, setup_django
+
+
+def run(handler, environ, requests):
+    from core import db
+
+    db.reset()
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = handler(dict(environ), lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        timings.append(time.perf_counter() - started)
+    opened = db.counters()['connections']
+    return {
+        'connections_per_100_requests': round(opened * 100 / requests, 1),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=500)
+    args = parser.parse_args()
+    scratch = tempfile.TemporaryDirectory()
+    if 'postgresql' not in os.environ.get('DB_ENGINE', ''):
+        os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+        os.environ['DB_NAME'] = os.path.join(scratch.name, 'db.sqlite3')
+    os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    setup_django()
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import RequestFactory, override_settings
+
+    override_settings(ALLOWED_HOSTS=['*']).enable()
+    call_command('migrate', verbosity=0)
+    call_command('seed_bench', posts=args.posts, users=50,
+                 comments=args.posts, stdout=io.StringIO())
+    handler = WSGIHandler()
+    environ = RequestFactory()._base_environ(PATH_INFO='/')
+    pooled = settings.DATABASES['default']['ENGINE'].endswith('_pool')
+    modes = {'pool': 0} if pooled else {'per_request': 0, 'persistent': 60}
+    results = {}
+    for mode, max_age in modes.items():
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        results[mode] = run(handler, environ, args.requests)
+    report('db_connections', {
+        'engine': settings.DATABASES['default']['ENGINE'],
+        'requests': args.requests,
+        **results,
+    })
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''Память потоковой выгрузки постов: она не должна расти с таблицей.
+
+Заполняет временную базу SQLite постами и после каждой отметки
+(по умолчанию 100 тысяч, 1 и 2 миллиона строк) выгружает всю таблицу
+в /dev/null, замеряя пик памяти Python через tracemalloc. Для сравнения
+на первой отметке меряется и dumpdata-подобная сериализация в памяти.
+
+    python benchmarks/export.py --rows 100000 1000000 2000000
+'''
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from utils import report, setup_django
+
+BATCH_SIZE: int = 10_000
+
+
+def fill(author, start, stop):
+    from django.db import transaction
+    from django.utils import timezone
+    from posts.models import Post
+
+    now = timezone.now()
+    for offset in range(start, stop, BATCH_SIZE):
+        with transaction.atomic():
+            Post.objects.bulk_create(
+                Post(text=f'Пост номер {number}', author=author,
+                     pub_date=now)
+                for number in range(offset, min(offset + BATCH_SIZE, stop))
+            )
+
+
+def measure(function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': round(seconds, 2), 'peak_kb': round(peak / 1024)}
+
+
+def export_all(format):
+    from posts import export
+    with open(os.devnull, 'w', encoding='utf-8') as output:
+        output.writelines(export.lines('posts', format))
+
+
+def serialize_all():
+    from django.core import serializers
+    from posts.models import Post
+    serializers.serialize('json', Post.objects.all())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--rows', type=int, nargs='+', default=(100_000, 1_000_000, 2_000_000))
+    parser.add_argument('--format', choices=('ndjson', 'csv'),
+                        default='ndjson')
+    args = parser.parse_args()
+    scratch = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = scratch.name
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    author = get_user_model().objects.create_user(username='bench')
+    results = {}
+    filled = 0
+    for rows in sorted(args.rows):
+        fill(author, filled, rows)
+        filled = rows
+        results[rows] = measure(lambda: export_all(args.format))
+        if len(results) == 1:
+            results[rows]['in_memory'] = measure(serialize_all)
+    report('export', {'format': args.format, 'rows': results})
+    scratch.close()
+
+
+if __name__ == '__main__':
+    main()
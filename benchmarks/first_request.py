@@ -0,0 +1,115 @@
+'''Первый запрос свежего воркера: с прогревом шаблонов и без него.
+
+Заполняет временную базу SQLite через seed_bench и запускает воркеры
+отдельными процессами, как после fork в gunicorn: каждый настраивает
+Django (с TEMPLATE_WARMUP=True прогрев идёт в CoreConfig.ready) и
+запрашивает ленту, страницу поста и профиль. Печатает медианы времени
+запуска, первого и второго запроса каждой страницы.
+
+    python benchmarks/first_request.py --workers 15
+'''
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils import report, setup_django
+
+
+def worker(urls, media_root):
+    started = time.perf_counter()
+    setup_django()
+    startup = time.perf_counter() - started
+    from django.test import Client, override_settings
+
+    override_settings(ALLOWED_HOSTS=['*'], MEDIA_ROOT=media_root).enable()
+    client = Client()
+    timings = {}
+    for url in urls:
+        timings[url] = []
+        for _ in range(2):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings[url].append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+    print(json.dumps({'startup': startup, 'requests': timings}))
+
+
+def run_workers(count, warmup, urls, media_root):
+    env = {**os.environ, 'TEMPLATE_WARMUP': str(warmup)}
+    samples = []
+    for _ in range(count):
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--media-root',
+             media_root, *urls],
+            env=env, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    return samples
+
+
+def ms(values):
+    return round(statistics.median(values) * 1000, 2)
+
+
+def summary(samples, urls):
+    return {
+        'startup_ms': ms([sample['startup'] for sample in samples]),
+        'pages': {
+            url: {
+                'first_ms': ms([s['requests'][url][0] for s in samples]),
+                'second_ms': ms([s['requests'][url][1] for s in samples]),
+            }
+            for url in urls
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=15)
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--media-root')
+    parser.add_argument('urls', nargs='*')
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.urls, args.media_root)
+        return
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = os.path.join(scratch.name, 'db.sqlite3')
+    # Без кеша страниц, чтобы второй запрос тоже собирал страницу.
+    os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    os.environ['TEMPLATE_WARMUP'] = 'False'
+    setup_django()
+    from django.core.management import call_command
+    from django.urls import reverse
+    from posts.models import Post, UserStats
+
+    call_command('migrate', verbosity=0)
+    call_command('seed_bench', posts=args.posts, users=50,
+                 comments=args.posts, stdout=io.StringIO())
+    author = UserStats.objects.order_by('-posts_count').first().user
+    urls = [
+        reverse('posts:index'),
+        reverse('posts:post_detail', args=[Post.objects.first().pk]),
+        reverse('posts:profile', args=[author.username]),
+    ]
+    media_root = os.path.join(scratch.name, 'media')
+    results = {
+        'cold': summary(
+            run_workers(args.workers, False, urls, media_root), urls),
+        'warm': summary(
+            run_workers(args.workers, True, urls, media_root), urls),
+    }
+    report('first_request', {'workers': args.workers, **results})
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+'''Сколько байт картинок скачивает страница ленты до и после srcset.
+
+До: каждый клиент получает миниатюру sorl 960x339 JPEG (качество 95).
+После: браузер выбирает из адаптивных копий самую узкую, которая
+покрывает ширину экрана с учётом плотности пикселей, и берёт WebP,
+если Pillow собран с его поддержкой.
+
+    python benchmarks/image_bytes.py --posts 10
+'''
+import argparse
+import random
+import tempfile
+from io import BytesIO
+
+from utils import report, setup_django
+
+# Ширина карточки в CSS-пикселях и плотность экрана типичных клиентов.
+CLIENTS = {
+    'mobile_1x': (320, 1),
+    'mobile_2x': (320, 2),
+    'tablet': (640, 1),
+    'desktop': (960, 1),
+}
+
+
+def make_photo(width, height, seed):
+    '''Синтетическое «фото»: градиент с шумом сжимается как снимок.'''
+    from PIL import Image, ImageFilter
+    rnd = random.Random(seed)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    noise = Image.effect_noise((width, height), rnd.randint(20, 60))
+    image = Image.merge('RGB', [
+        Image.blend(channel, noise, 0.3) for channel in image.split()
+    ])
+    image = image.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def sorl_card_size(content):
+    from PIL import Image, ImageOps
+    image = Image.open(BytesIO(content))
+    card = ImageOps.fit(image, (960, 339), Image.LANCZOS)
+    buffer = BytesIO()
+    card.save(buffer, 'JPEG', quality=95)
+    return len(buffer.getvalue())
+
+
+def chosen_size(variants, css_width, density):
+    '''Размер копии, которую выберет браузер по srcset.'''
+    from posts.derivatives import webp_supported
+    image_format = 'WEBP' if webp_supported() else None
+    candidates = [
+        v for v in variants
+        if (v['format'] == 'WEBP') == (image_format == 'WEBP')
+    ]
+    candidates.sort(key=lambda v: v['width'])
+    need = css_width * density
+    for variant in candidates:
+        if variant['width'] >= need:
+            return variant['size']
+    return candidates[-1]['size']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=10)
+    parser.add_argument('--width', type=int, default=2400)
+    parser.add_argument('--height', type=int, default=1600)
+    args = parser.parse_args()
+    setup_django()
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.test import override_settings
+    from posts import derivatives
+
+    before = dict.fromkeys(CLIENTS, 0)
+    after = dict.fromkeys(CLIENTS, 0)
+    with tempfile.TemporaryDirectory() as media_root, override_settings(
+        MEDIA_ROOT=media_root,
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ):
+        for number in range(args.posts):
+            content = make_photo(args.width, args.height, number)
+            name = default_storage.save(
+                f'posts/photo{number}.jpg', ContentFile(content))
+            variants = derivatives.generate(name)
+            card = sorl_card_size(content)
+            for client, (css_width, density) in CLIENTS.items():
+                before[client] += card
+                after[client] += chosen_size(variants, css_width, density)
+    report('image_bytes', {
+        'posts': args.posts,
+        'webp': derivatives.webp_supported(),
+        'bytes_before': before,
+        'bytes_after': after,
+        'saved_percent': {
+            client: round(100 * (1 - after[client] / before[client]), 1)
+            for client in CLIENTS
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()
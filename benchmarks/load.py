@@ -0,0 +1,209 @@
+'''Нагрузочный прогон основных страниц: задержки, запросы к базе, RPS.
+
+Данные заранее создаёт команда seed_bench в базе из DB_*:
+
+    cd yatube && python manage.py seed_bench --users 1000 --posts 100000
+    python benchmarks/load.py --requests 200
+    python benchmarks/load.py --mode wsgi --concurrency 4
+
+В режиме client запросы идут через django.test.Client в этом же
+процессе; в режиме wsgi - по HTTP к локальному серверу в потоке или к
+адресу из --url. Число запросов к базе берётся из заголовка
+Server-Timing, поэтому прогон включает SERVER_TIMING. Результат - одна
+строка JSON с коммитом, чтобы сравнивать прогоны между коммитами.
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import BASE_DIR, report, setup_django
+
+PAGES = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+
+
+def targets():
+    '''Адреса страниц: самая большая группа, автор и обсуждение.'''
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+    from django.urls import reverse
+    from posts.models import Group, Post, UserStats
+
+    group = Group.objects.annotate(
+        posts_total=Count('posts')).order_by('-posts_total').first()
+    author = UserStats.objects.order_by('-posts_count').first()
+    post = Post.objects.annotate(
+        comments_total=Count('comments')).order_by('-comments_total').first()
+    reader = UserStats.objects.order_by('-following_count').first()
+    if not (group and author and post and reader):
+        raise SystemExit('База пуста: сначала запустите seed_bench')
+    username = get_user_model().objects.get(pk=author.user_id).username
+    return reader.user_id, {
+        'index': reverse('posts:index'),
+        'group_list': reverse(
+            'posts:group_list', kwargs={'slug': group.slug}),
+        'profile': reverse('posts:profile', kwargs={'username': username}),
+        'post_detail': reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}),
+        'follow_index': reverse('posts:follow_index'),
+    }
+
+
+def queries_from(header):
+    '''Число запросов из Server-Timing: db;dur=1.2;desc="5 queries".'''
+    for metric in (header or '').split(','):
+        if metric.strip().startswith('db;'):
+            desc = metric.split('desc="', 1)[1]
+            return int(desc.split(' ', 1)[0])
+    return None
+
+
+class ClientTransport:
+    def __init__(self, reader_id):
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+        self.anonymous = Client()
+        self.reader = Client()
+        self.reader.force_login(
+            get_user_model().objects.get(pk=reader_id))
+        self.lock = threading.Lock()
+
+    def get(self, url, login):
+        client = self.reader if login else self.anonymous
+        with self.lock:
+            response = client.get(url)
+        return response.status_code, response.get('Server-Timing')
+
+
+class HttpTransport:
+    def __init__(self, reader_id, base_url):
+        from django.contrib.auth import get_user_model
+        from django.test import Client
+        client = Client()
+        client.force_login(get_user_model().objects.get(pk=reader_id))
+        session = client.cookies['sessionid'].value
+        self.cookie = f'sessionid={session}'
+        self.base_url = base_url.rstrip('/')
+
+    def get(self, url, login):
+        request = urllib.request.Request(self.base_url + url)
+        if login:
+            request.add_header('Cookie', self.cookie)
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status, response.headers.get('Server-Timing')
+
+
+def serve():
+    '''Поднимает WSGI-сервер Django в потоке и возвращает его адрес.'''
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import (WSGIRequestHandler, WSGIServer,
+                                       make_server)
+
+    from django.core.handlers.wsgi import WSGIHandler
+
+    class Server(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = make_server(
+        '127.0.0.1', 0, WSGIHandler(),
+        server_class=Server, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def percentile(timings, share):
+    ordered = sorted(timings)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return round(ordered[index], 2)
+
+
+def run_page(transport, url, login, requests, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        status, header = transport.get(url, login)
+        elapsed = (time.perf_counter() - started) * 1000
+        return status, elapsed, queries_from(header)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    timings = [elapsed for _, elapsed, _ in results]
+    queries = [count for _, _, count in results if count is not None]
+    errors = sum(1 for status, _, _ in results if status >= 400)
+    return {
+        'p50_ms': percentile(timings, 0.50),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'queries_per_request': (
+            round(statistics.mean(queries), 2) if queries else None),
+        'rps': round(requests / wall, 1),
+        'errors': errors,
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=('client', 'wsgi'),
+                        default='client')
+    parser.add_argument('--url', help='Уже запущенный сервер для wsgi')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES)
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Отключить кеш, чтобы мерить саму выборку и рендер')
+    args = parser.parse_args()
+    os.environ.setdefault('SERVER_TIMING', 'True')
+    setup_django()
+    from django.test import override_settings
+    overrides = {'ALLOWED_HOSTS': ['*']}
+    if args.no_cache:
+        overrides['CACHES'] = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    override_settings(**overrides).enable()
+
+    reader_id, urls = targets()
+    if args.mode == 'client':
+        transport = ClientTransport(reader_id)
+    else:
+        transport = HttpTransport(reader_id, args.url or serve())
+    results = {}
+    for page in args.pages:
+        login = page == 'follow_index'
+        for _ in range(args.warmup):
+            transport.get(urls[page], login)
+        results[page] = run_page(
+            transport, urls[page], login, args.requests, args.concurrency)
+    report('load', {
+        'commit': commit(),
+        'mode': args.mode,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'cache': not args.no_cache,
+        'pages': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
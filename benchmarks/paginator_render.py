@@ -0,0 +1,77 @@
+'''Рендер includes/paginator.html для ленты в миллион постов.
+
+До: ссылка на каждую из num_pages страниц (page_range). После: края и
+окно вокруг текущей страницы (elided_range). Базой служит сам шаблон,
+в котором elided_range заменён обратно на paginator.page_range.
+
+    python benchmarks/paginator_render.py --posts 1000000
+'''
+import argparse
+import os
+import statistics
+import time
+
+from utils import PROJECT_DIR, report, setup_django
+
+
+class Sized:
+    '''Список постов, у которого известна только длина.'''
+
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def __getitem__(self, item):
+        return []
+
+
+def timed(render, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        html = render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2), len(html.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--page', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+    from django.core.paginator import Paginator
+    from django.template import Context, Engine
+    from posts.paginators import elided_page_range
+
+    path = os.path.join(PROJECT_DIR, 'templates', 'includes',
+                        'paginator.html')
+    with open(path, encoding='utf-8') as source:
+        after_source = source.read()
+    before_source = after_source.replace(
+        'page_obj.elided_range', 'page_obj.paginator.page_range')
+    engine = Engine.get_default()
+    page = Paginator(Sized(args.posts), args.per_page).page(args.page)
+    page.elided_range = elided_page_range(page)
+    context = {'page_obj': page}
+    results = {}
+    for name, source in (('before', before_source),
+                         ('after', after_source)):
+        template = engine.from_string(source)
+        render_ms, html_bytes = timed(
+            lambda: template.render(Context(context)), args.repeat)
+        results[name] = {'render_ms': render_ms, 'html_bytes': html_bytes}
+    report('paginator_render', {
+        'posts': args.posts,
+        'pages': page.paginator.num_pages,
+        'page': args.page,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
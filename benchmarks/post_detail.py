@@ -0,0 +1,94 @@
+'''Страница поста против числа комментариев.
+
+Для каждого размера создаёт пост с N комментариями во временной базе
+SQLite и меряет медиану ответа posts:post_detail (первая страница
+комментариев встроена в HTML) и фрагмента posts:post_comments из
+середины обсуждения. Для сравнения - прежнее поведение: выборка и рендер
+всех комментариев поста разом.
+
+    python benchmarks/post_detail.py --sizes 100,1000,10000,50000
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from utils import report, setup_django
+
+
+def median_ms(call, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='100,1000,10000,50000')
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DB_NAME'] = os.path.join(scratch.name, 'db.sqlite3')
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.template.loader import render_to_string
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from django.utils import timezone
+    from posts import stats
+    from posts.models import Comment, Post
+    from posts.paginators import CommentPaginator
+
+    override_settings(
+        ALLOWED_HOSTS=['*'],
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    ).enable()
+    call_command('migrate', verbosity=0)
+    author = get_user_model().objects.create_user(username='bench')
+    client = Client()
+    results = {}
+    for size in map(int, args.sizes.split(',')):
+        post = Post.objects.create(text=f'Пост на {size}', author=author)
+        now = timezone.now()
+        comments = [
+            Comment(post=post, author=author, text=f'Комментарий {i}',
+                    created=now + timedelta(milliseconds=i))
+            for i in range(size)
+        ]
+        Comment.objects.bulk_create(
+            comments, batch_size=connection.ops.bulk_batch_size(
+                Comment._meta.concrete_fields, comments))
+        stats.reconcile_comments()
+        url = reverse('posts:post_detail', args=[post.pk])
+        everything = Comment.objects.filter(post=post).for_feed()
+        # Курсор из середины обсуждения.
+        deep = CommentPaginator(everything, 1).encode(
+            everything.order_by('created', 'pk')[size // 2])
+        fragment = reverse('posts:post_comments', args=[post.pk])
+        results[size] = {
+            'post_detail_ms': median_ms(
+                lambda: client.get(url), args.requests),
+            'deep_fragment_ms': median_ms(
+                lambda: client.get(
+                    fragment, {'after': deep}),
+                args.requests),
+            'all_comments_ms': median_ms(
+                lambda: render_to_string('includes/comments.html', {
+                    'comments': everything.all(), 'post_id': post.pk}),
+                max(3, args.requests // 10)),
+        }
+    report('post_detail', {'sizes': results})
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+'''Задержка поиска по постам: полнотекстовый индекс против LIKE.
+
+Генерирует корпус постов из случайных русских слов в отдельной базе,
+заполняет индекс и сравнивает первую страницу выдачи search с прежним
+поиском админки text ILIKE '%слово%'. По умолчанию база - временный
+файл SQLite (FTS5); чтобы измерить PostgreSQL (GIN), укажите --env-db
+и настройте DB_* на пустую базу.
+
+    python benchmarks/search.py --posts 1000000
+'''
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from utils import report, setup_django
+
+WORDS = (
+    'котик собака город река лес море солнце дождь книга музыка '
+    'работа дорога поезд самолёт школа учитель друг семья праздник '
+    'осень зима весна лето утро вечер ночь кофе чай хлеб окно дом '
+    'улица парк мост гора поле снег ветер звезда небо фильм театр'
+).split()
+RARE_WORDS = ('синхрофазотрон', 'фотосинтез', 'палеонтология')
+QUERIES = ('котик', 'поезд вечер', 'синхрофазотрон', 'фото')
+BATCH_SIZE: int = 10_000
+
+
+def make_text(rnd):
+    words = rnd.choices(WORDS, k=rnd.randint(8, 40))
+    if rnd.random() < 0.001:
+        words.append(rnd.choice(RARE_WORDS))
+    return ' '.join(words).capitalize()
+
+
+def fill(posts, seed):
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.utils import timezone
+    from posts import search
+    from posts.models import Post
+
+    author = get_user_model().objects.create_user(username='bench')
+    rnd = random.Random(seed)
+    now = timezone.now()
+    for start in range(0, posts, BATCH_SIZE):
+        with transaction.atomic():
+            Post.objects.bulk_create(
+                Post(text=make_text(rnd), author=author, pub_date=now)
+                for _ in range(start, min(start + BATCH_SIZE, posts))
+            )
+    search.rebuild()
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def like_page(query):
+    from django.db.models import Q
+    from posts.models import Post
+    condition = Q()
+    for word in query.split():
+        condition &= Q(text__icontains=word)
+    return list(Post.objects.filter(condition).order_by('-pk')[:10])
+
+
+def search_page(query):
+    from posts.search import SearchPaginator
+    return list(SearchPaginator(query, 10).get_cursor_page())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--env-db', action='store_true',
+        help='Использовать базу из DB_* вместо временного SQLite')
+    args = parser.parse_args()
+    scratch = None
+    if not args.env_db:
+        scratch = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+        os.environ['DB_NAME'] = scratch.name
+    setup_django()
+    from django.core.management import call_command
+    from posts import search
+
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    fill(args.posts, args.seed)
+    fill_seconds = round(time.perf_counter() - started, 1)
+    results = {}
+    for query in QUERIES:
+        results[query] = {
+            'like_ms': timed(lambda: like_page(query), args.repeat),
+            'search_ms': timed(lambda: search_page(query), args.repeat),
+        }
+    report('search', {
+        'posts': args.posts,
+        'backend': search.backend(),
+        'fill_seconds': fill_seconds,
+        'queries': results,
+    })
+    if scratch is not None:
+        scratch.close()
+
+
+if __name__ == '__main__':
+    main()
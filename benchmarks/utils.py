@@ -0,0 +1,20 @@
+'''Общие помощники бенчмарков: запуск Django вне manage.py и вывод.'''
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django():
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def report(name, results):
+    '''Печатает результаты одной строкой JSON, удобной для сравнения.'''
+    print(json.dumps({'benchmark': name, **results}, ensure_ascii=False))
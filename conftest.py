@@ -0,0 +1,3 @@
+pytest_plugins = [
+    'core.pytest_query_budget',
+]
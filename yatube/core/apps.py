@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import db
+        request_started.connect(db.health_check)
+        request_finished.connect(db.request_done)
+        connection_created.connect(db.connection_opened)
+        # django.contrib.admin стоит в INSTALLED_APPS раньше, так что
+        # модели уже зарегистрированы и адреса админки попадут в резолвер.
+        if settings.TEMPLATE_WARMUP:
+            from .warmup import warm
+            warm()
@@ -0,0 +1,76 @@
+'''PostgreSQL с пулом соединений внутри процесса.
+
+ENGINE = 'core.backends.postgresql_pool' и POOL = {'MIN_SIZE': 1,
+'MAX_SIZE': 10} в настройках базы (см. DB_POOL_SIZE). Соединение
+берётся из psycopg2.pool.ThreadedConnectionPool, а при закрытии - в
+конце запроса, CONN_MAX_AGE = 0 - возвращается в пул открытым; пул
+откатывает незавершённую транзакцию. Пул создаётся при первом
+соединении в процессе, поэтому воркеры после fork не делят сокеты.
+MAX_SIZE должен быть не меньше числа потоков воркера: когда свободных
+соединений нет, пул бросает PoolError.
+
+connection_created здесь приходит на каждую выдачу соединения из пула,
+поэтому в счётчик core.db попадают только соединения, которые пул
+действительно открыл.
+'''
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+from core import db
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class CountingConnectionPool(pool.ThreadedConnectionPool):
+    '''Пул, который учитывает открытые им соединения в core.db.'''
+
+    def _connect(self, key=None):
+        connection = super()._connect(key)
+        db.opened()
+        return connection
+
+
+def get_pool(alias, conn_params, min_size, max_size):
+    with _lock:
+        if alias not in _pools:
+            _pools[alias] = CountingConnectionPool(
+                min_size, max_size, **conn_params)
+        return _pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # connection_created не означает нового соединения: см. core.db.
+    pooled = True
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL') or {}
+        return get_pool(
+            self.alias, conn_params,
+            options.get('MIN_SIZE', 1), options.get('MAX_SIZE', 10))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.getconn()
+        if connection.closed:
+            # Соединение умерло, пока лежало в пуле.
+            self.pool.putconn(connection, close=True)
+            connection = self.pool.getconn()
+        # Дальше - как в django.db.backends.postgresql.
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(
+                    self.connection, close=bool(self.connection.closed))
@@ -0,0 +1,58 @@
+'''Ключи приложений в общем кеше и сброс по поколениям.
+
+Кеш задаётся переменными CACHE_* и может быть общим для всех процессов
+(файлы, база, memcached, redis). Чтобы ключи приложений не пересекались,
+каждое приложение строит их через app_key('posts', ...). Сброс
+целой группы ключей - сдвиг поколения: поколение лежит в том же общем
+кеше, поэтому сдвиг в одном процессе сразу видят остальные.
+'''
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+GENERATION_KEY: str = 'generation:{}'
+CHANGED_KEY: str = 'changed:{}'
+
+
+def app_key(app_label, key):
+    return f'{app_label}:{key}'
+
+
+def _new_generation():
+    # Новое поколение - случайное значение, а не cache.incr: incr в
+    # файловом кеше и в базе - это get и set, и два процесса, сдвигая
+    # поколение одновременно, записали бы одно и то же число. Случайное
+    # значение не совпадёт ни с одним из прежних, даже если поколение
+    # вытеснили из кеша.
+    return uuid.uuid4().hex
+
+
+def generation(app_label, scope):
+    key = app_key(app_label, GENERATION_KEY.format(scope))
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _new_generation(), None)
+        # Когда менялись данные до потери поколения, неизвестно: считаем,
+        # что сейчас.
+        cache.add(app_key(app_label, CHANGED_KEY.format(scope)),
+                  time.time(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(app_label, scope):
+    cache.set_many({
+        app_key(app_label, GENERATION_KEY.format(scope)): _new_generation(),
+        app_key(app_label, CHANGED_KEY.format(scope)): time.time(),
+    }, None)
+
+
+def changed_at(app_label, *scopes):
+    '''Когда данные последний раз менялись; None, если неизвестно.'''
+    keys = [app_key(app_label, CHANGED_KEY.format(scope)) for scope in scopes]
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        return None
+    return datetime.fromtimestamp(max(values.values()), timezone.utc)
@@ -0,0 +1,76 @@
+'''Соединения с базой между запросами: проверка и учёт.
+
+С CONN_MAX_AGE воркер переиспользует соединение, а не открывает новое
+на каждый запрос. Django 2.2 закрывает такое соединение, только если
+истёк срок или в нём была ошибка, поэтому оборванное между запросами
+соединение (перезапуск PostgreSQL, pgbouncer) ломало бы первый запрос
+после обрыва. С CONN_HEALTH_CHECKS в настройках базы соединение
+проверяется в начале запроса и, если не отвечает, закрывается: Django
+откроет новое. Проверка - один SELECT 1, дешевле нового соединения.
+
+Счётчик открытых соединений показывает, сколько их приходится на
+запросы; с DB_CONNECTION_LOG_EVERY = N он пишется в лог каждые N
+запросов.
+'''
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('yatube.performance')
+
+_lock = threading.Lock()
+_counters = {'connections': 0, 'requests': 0}
+
+
+def health_check(**kwargs):
+    '''request_started: закрывает переиспользуемые мёртвые соединения.'''
+    for connection in connections.all():
+        if (connection.connection is None
+                or connection.in_atomic_block
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def opened():
+    with _lock:
+        _counters['connections'] += 1
+
+
+def connection_opened(sender, connection, **kwargs):
+    # Бэкенд с пулом шлёт сигнал при каждой выдаче соединения из пула и
+    # сам вызывает opened(), когда пул открывает новое.
+    if not getattr(connection, 'pooled', False):
+        opened()
+
+
+def request_done(**kwargs):
+    every = settings.DB_CONNECTION_LOG_EVERY
+    with _lock:
+        _counters['requests'] += 1
+        if not every or _counters['requests'] < every:
+            return
+        counters = dict(_counters)
+        _reset()
+    # WARNING, как и медленные запросы: без настройки LOGGING строки
+    # уровнем ниже не выводятся, а счётчик включают явно.
+    logger.warning(
+        'Соединений с базой: %(connections)s на %(requests)s запросов',
+        counters)
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def _reset():
+    _counters.update(connections=0, requests=0)
+
+
+def reset():
+    with _lock:
+        _reset()
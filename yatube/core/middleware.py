@@ -0,0 +1,103 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import routers, timing
+
+logger = logging.getLogger('yatube.performance')
+
+# Метрика Server-Timing -> описание для панели браузера.
+METRICS = {
+    'db': 'SQL',
+    'tpl': 'Templates',
+    'thumb': 'Thumbnails',
+}
+
+
+class ServerTimingMiddleware:
+    '''Отдаёт в заголовке Server-Timing, куда ушло время запроса.
+
+    Считает запросы и время SQL, рендер шаблонов и поиск миниатюр.
+    Медленные запросы дополнительно пишет в лог строкой JSON. Включается
+    переменной окружения SERVER_TIMING; выключенная убирает себя из
+    цепочки middleware и ничего не стоит.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        timing.instrument_templates()
+
+    def __call__(self, request):
+        token = timing.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.sql_wrapper))
+                response = self.get_response(request)
+            timings = timing.current()
+        finally:
+            timing.stop(token)
+        total = round((time.perf_counter() - started) * 1000, 2)
+        response['Server-Timing'] = self.header(timings, total)
+        slow_ms = settings.SERVER_TIMING_LOG_MS
+        if slow_ms is not None and total >= slow_ms:
+            logger.warning(json.dumps(
+                self.record(request, response, timings, total)))
+        return response
+
+    @staticmethod
+    def header(timings, total):
+        metrics = []
+        for name, description in METRICS.items():
+            if name == 'db':
+                description = f'{timings.counts[name]} queries'
+            metrics.append(
+                f'{name};dur={timings.milliseconds(name)};'
+                f'desc="{description}"'
+            )
+        metrics.append(f'total;dur={total}')
+        return ', '.join(metrics)
+
+    @staticmethod
+    def record(request, response, timings, total):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': total,
+            'queries': timings.counts['db'],
+            'db_ms': timings.milliseconds('db'),
+            'tpl_ms': timings.milliseconds('tpl'),
+            'thumb_ms': timings.milliseconds('thumb'),
+        }
+
+
+class ReplicaPinMiddleware:
+    '''Состояние реплик на время запроса и привязка к default после
+    записи (core.routers). Без настроенных реплик убирает себя из
+    цепочки middleware.
+    '''
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICA_ALIASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.start(pinned=routers.is_pinned(request))
+        try:
+            response = self.get_response(request)
+            if routers.current().wrote:
+                routers.pin(response)
+        finally:
+            routers.stop(token)
+        return response
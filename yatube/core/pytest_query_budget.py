@@ -0,0 +1,28 @@
+'''Плагин pytest для бюджета запросов (см. core.query_budget).
+
+Добавляет опцию --update-query-budget и сводку числа запросов по
+представлениям в конце прогона. Подключается корневым conftest.py.
+'''
+import os
+
+from core import query_budget as budget
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-query-budget', action='store_true',
+        help='Записать текущие числа запросов в QUERY_BUDGET_BASELINE',
+    )
+
+
+def pytest_configure(config):
+    if config.getoption('update_query_budget'):
+        os.environ['QUERY_BUDGET_UPDATE'] = '1'
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not budget.recorded:
+        return
+    terminalreporter.section('query budget')
+    for name, (count, _) in sorted(budget.recorded.items()):
+        terminalreporter.write_line(f'{name}: {count}')
@@ -0,0 +1,122 @@
+'''Бюджет SQL-запросов для представлений.
+
+Тест оборачивает запрос страницы в query_budget('posts:index'), и число
+запросов сравнивается с записанным в файле QUERY_BUDGET_BASELINE. Если
+запросов стало больше, тест падает и показывает, каких запросов раньше
+не было и какие повторяются (типичный след N+1). Чтобы записать новые
+значения, тесты запускают с QUERY_BUDGET_UPDATE=1 или с
+pytest --update-query-budget и кладут изменённый файл в коммит.
+'''
+import json
+import os
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+FINGERPRINT_RULES = (
+    (re.compile(r'"s\d+_x\d+"'), '"?"'),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+# Замеры текущего прогона: имя -> (запросов, слепки). Их печатает
+# плагин pytest в конце прогона.
+recorded = {}
+
+
+def fingerprint(sql):
+    '''SQL без значений: одинаковые по форме запросы совпадают.'''
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def update_mode():
+    return os.getenv('QUERY_BUDGET_UPDATE', '') not in ('', '0')
+
+
+def load_baseline(path=None):
+    path = path or settings.QUERY_BUDGET_BASELINE
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(data, path=None):
+    path = path or settings.QUERY_BUDGET_BASELINE
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(data, baseline, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        baseline.write('\n')
+
+
+def report(name, fingerprints, budget):
+    '''Текст ошибки: что добавилось и что повторяется.'''
+    known = set(budget.get('fingerprints', ()))
+    counts = Counter(fingerprints)
+    lines = [
+        f'{name}: {len(fingerprints)} запросов при бюджете '
+        f'{budget["queries"]}'
+    ]
+    new = [sql for sql in counts if sql not in known]
+    if new:
+        lines.append('Новые запросы:')
+        lines.extend(f'  {sql}' for sql in new)
+    duplicates = [
+        (sql, count) for sql, count in counts.items() if count > 1]
+    if duplicates:
+        lines.append('Повторяющиеся запросы:')
+        lines.extend(f'  {count}x {sql}' for sql, count in duplicates)
+    return '\n'.join(lines)
+
+
+def check(name, queries, path=None):
+    '''Сверяет запросы с бюджетом; в режиме обновления записывает их.'''
+    fingerprints = [fingerprint(query['sql']) for query in queries]
+    recorded[name] = (len(fingerprints), fingerprints)
+    baseline = load_baseline(path)
+    if update_mode():
+        baseline[name] = {
+            'queries': len(fingerprints),
+            'fingerprints': sorted(set(fingerprints)),
+        }
+        save_baseline(baseline, path)
+        return
+    budget = baseline.get(name)
+    if budget is None:
+        raise AssertionError(
+            f'Для {name} нет бюджета запросов: запустите тесты с '
+            f'QUERY_BUDGET_UPDATE=1')
+    if len(fingerprints) > budget['queries']:
+        raise AssertionError(report(name, fingerprints, budget))
+
+
+class query_budget(ContextDecorator):
+    '''Контекстный менеджер и декоратор проверки бюджета запросов.
+
+    with query_budget('posts:index'):
+        self.client.get('/')
+    '''
+
+    def __init__(self, name, using=connection, path=None):
+        self.name = name
+        self.path = path
+        self.context = CaptureQueriesContext(using)
+
+    def __enter__(self):
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            check(self.name, self.context.captured_queries, self.path)
+        return False
@@ -0,0 +1,155 @@
+'''Чтение с реплик для представлений, которые только читают.
+
+Представления, помеченные @read_replica (ленты, профиль, пост, поиск,
+API), читают с одной из реплик DB_REPLICA_ALIASES; всё остальное, в
+том числе любые записи и чтения внутри изменяющих запросов, идёт в
+default. Реплика выбирается одна на запрос.
+
+Чтобы пользователь сразу видел свои изменения, ReplicaPinMiddleware
+после запроса, в котором была запись в базу, ставит cookie: пока она
+жива (DB_REPLICA_PIN_SECONDS), этот клиент читает только с default.
+Запись замечает сам роутер в db_for_write, поэтому отдельно помечать
+изменяющие представления не нужно. Общий кеш страниц мог получить
+страницу, собранную с отстающей реплики, поэтому такой клиент страницу
+из кеша не берёт, а собирает заново и перезаписывает (pinned()).
+
+Кеш в базе (DatabaseCache) тоже ходит через роутер, с app_label
+django_cache. Он всегда читает и пишет в default: с отстающей реплики
+пришли бы старые поколения, а его записи - блокировки, поколения,
+страницы - не изменения пользователя и клиента к default не привязывают.
+
+Недоступная реплика пропускается на DB_REPLICA_RETRY_SECONDS; если
+недоступны все, чтение идёт в default.
+'''
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('yatube.performance')
+
+PIN_COOKIE: str = 'primary_until'
+# Всегда читаются из default: сессия и кеш в базе.
+PRIMARY_APPS: tuple = ('sessions', 'django_cache')
+CACHE_APP: str = 'django_cache'
+
+_current = ContextVar('replica_request', default=None)
+_down_until = {}
+
+
+class ReplicaState:
+    '''Что известно о базах в текущем запросе.'''
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.reading = False
+        self.wrote = False
+        self.alias = None
+
+
+def current():
+    return _current.get()
+
+
+def start(pinned=False):
+    return _current.set(ReplicaState(pinned))
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def pinned():
+    '''Текущий запрос читает с default после недавней записи клиента.'''
+    state = _current.get()
+    return state is not None and state.pinned
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin(response):
+    '''Ставит cookie, по которой клиент читает с default.'''
+    seconds = settings.DB_REPLICA_PIN_SECONDS
+    response.set_cookie(
+        PIN_COOKIE, str(time.time() + seconds), max_age=seconds,
+        httponly=True, samesite='Lax')
+
+
+def available(alias):
+    if time.monotonic() < _down_until.get(alias, 0):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as error:
+        _down_until[alias] = (
+            time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS)
+        logger.warning('Реплика %s недоступна: %s', alias, error)
+        return False
+    return True
+
+
+def choose_replica():
+    '''Случайная доступная реплика или default.'''
+    aliases = list(settings.DB_REPLICA_ALIASES)
+    random.shuffle(aliases)
+    for alias in aliases:
+        if available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+def read_replica(view):
+    '''Представление только читает: его запросы можно слать на реплику.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _current.get()
+        if state is None:
+            return view(request, *args, **kwargs)
+        state.reading = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.reading = False
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (state is None or not state.reading or state.pinned
+                or state.wrote):
+            return None
+        # Только что созданная сессия могла не дойти до реплики.
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        if state.alias is None:
+            state.alias = choose_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None and model._meta.app_label != CACHE_APP:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default: объекты с них можно связывать.
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICA_ALIASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему на реплики приносит репликация.
+        if db in settings.DB_REPLICA_ALIASES:
+            return False
+        return None
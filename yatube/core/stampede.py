@@ -0,0 +1,161 @@
+'''Кеш без «набега»: одно вычисление значения на ключ.
+
+Когда закешированное значение истекает, все одновременные запросы
+разом идут его пересчитывать и нагружают базу. get_or_set защищает от
+этого тремя приёмами:
+
+- пересчёт под замком на ключ с коротким сроком аренды: считает один
+  запрос, остальные ждут его результата;
+- пока идёт пересчёт, остальные получают прежнее значение, если оно
+  относится к той же версии данных (stale-while-revalidate);
+- вероятностное раннее истечение (XFetch): чем ближе срок и дольше
+  считалось значение, тем вероятнее, что какой-то запрос обновит его
+  заранее, до общего истечения.
+
+Замок берётся через cache.add, который атомарен в LocMemCache (внутри
+процесса), в кеше в базе и в memcached/redis. FileBasedCache.add не
+атомарен между процессами, поэтому для него замок - файл в каталоге
+кеша, созданный с O_EXCL.
+'''
+import hashlib
+import math
+import os
+import random
+import time
+import uuid
+from collections import namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+LEASE: int = 10
+WAIT_STEP: float = 0.05
+BETA: float = 1.0
+LOCK_KEY: str = 'stampede:lock:{}'
+
+
+class Entry(namedtuple('Entry', 'value version expires delta')):
+    '''Значение, версия данных, мягкий срок и время вычисления.'''
+    __slots__ = ()
+
+    def is_fresh(self, version, beta=BETA):
+        if self.version != version:
+            return False
+        if self.expires is None:
+            return True
+        early = self.delta * beta * -math.log(1.0 - random.random())
+        return time.time() + early < self.expires
+
+
+def _backend(cache):
+    # Прокси django.core.cache.cache - не экземпляр бэкенда, и по нему не
+    # понять, файловый ли кеш.
+    return caches['default'] if cache is None else cache
+
+
+def _lock_path(cache, key):
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return os.path.join(cache._dir, f'{digest}.lock')
+
+
+def acquire(key, lease=LEASE, cache=None):
+    '''Берёт замок на ключ; возвращает токен или None.'''
+    token = uuid.uuid4().hex
+    cache = _backend(cache)
+    if isinstance(cache, FileBasedCache):
+        path = _lock_path(cache, key)
+        os.makedirs(cache._dir, exist_ok=True)
+        for _ in range(2):
+            try:
+                lock = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < lease:
+                        return None
+                    # Аренда истекла: хозяин замка упал или завис.
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(lock, 'w') as lock_file:
+                lock_file.write(token)
+            return token
+        return None
+    if cache.add(LOCK_KEY.format(key), token, lease):
+        return token
+    return None
+
+
+def release(key, token, cache=None):
+    cache = _backend(cache)
+    # Если аренда истекла и замок взял другой, его замок не трогаем.
+    if isinstance(cache, FileBasedCache):
+        path = _lock_path(cache, key)
+        try:
+            with open(path) as lock_file:
+                if lock_file.read() == token:
+                    os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    lock_key = LOCK_KEY.format(key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _store(key, compute, timeout, version, cache):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        cache.set(key, Entry(value, version, None, delta), None)
+    else:
+        # Прежнее значение живёт ещё один срок, чтобы его можно было
+        # отдавать, пока идёт пересчёт.
+        cache.set(
+            key, Entry(value, version, time.time() + timeout, delta),
+            timeout * 2)
+    return value
+
+
+def refresh(key, compute, timeout, version=None, cache=None):
+    '''Пересчитывает значение без проверки кеша и кладёт его в кеш.'''
+    return _store(key, compute, timeout, version, _backend(cache))
+
+
+def get_or_set(key, compute, timeout, version=None, lease=LEASE,
+               beta=BETA, cache=None):
+    '''Значение из кеша или compute(), посчитанное одним запросом.
+
+    version - отпечаток данных (например, поколения кеша лент): запись
+    другой версии не отдаётся даже как устаревшая.
+    '''
+    cache = _backend(cache)
+    entry = cache.get(key)
+    if isinstance(entry, Entry) and entry.is_fresh(version, beta):
+        return entry.value
+    usable = isinstance(entry, Entry) and entry.version == version
+    token = acquire(key, lease, cache)
+    if token is None and usable:
+        return entry.value
+    deadline = time.monotonic() + lease
+    while token is None:
+        if time.monotonic() >= deadline:
+            # Хозяин замка не справился за аренду: считаем сами.
+            return _store(key, compute, timeout, version, cache)
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if isinstance(entry, Entry) and entry.version == version:
+            return entry.value
+        # Замок свободен, а значения нет: compute() хозяина упал. Пересчёт
+        # берёт один из ждущих, а не все по истечении аренды.
+        token = acquire(key, lease, cache)
+        if token is not None:
+            entry = cache.get(key)
+            if isinstance(entry, Entry) and entry.version == version:
+                release(key, token, cache)
+                return entry.value
+    try:
+        return _store(key, compute, timeout, version, cache)
+    finally:
+        release(key, token, cache)
@@ -0,0 +1,49 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from .. import stampede
+
+register = template.Library()
+
+
+class StampedeCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'stampede_cache tag got a non-integer timeout value: '
+                    f'{timeout!r}')
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on])
+        return stampede.get_or_set(
+            key, lambda: self.nodelist.render(context), timeout)
+
+
+@register.tag('stampede_cache')
+def do_stampede_cache(parser, token):
+    '''Замена {% cache %} с защитой от одновременного пересчёта.
+
+    {% stampede_cache 300 sidebar user.pk %} ... {% endstampede_cache %}
+    '''
+    nodelist = parser.parse(('endstampede_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments.")
+    return StampedeCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -0,0 +1,24 @@
+'''Помощники для тестов, которым нужны колбэки transaction.on_commit.
+
+TestCase держит каждый тест в транзакции и откатывает её, поэтому
+Django 2.2 не вызывает колбэки, отложенные до коммита: сброс поколений
+кеша, удаление карточек и т.п. Блок on_commit_callbacks() выполняет их,
+как будто транзакция блока закоммитилась.
+'''
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def on_commit_callbacks(using=DEFAULT_DB_ALIAS):
+    '''Выполняет колбэки on_commit, добавленные внутри блока.'''
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    # Колбэк может отложить следующий: выполняем, пока очередь растёт.
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
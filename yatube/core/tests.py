@@ -1,5 +1,36 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipIf
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import Error, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.template import Context, Template, engines
+from django.template.loaders import cached
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from . import (caches, db, query_budget, routers, stampede, timing,
+               warmup)
+
+try:
+    from psycopg2 import pool as psycopg2_pool
+
+    from .backends.postgresql_pool import base as pool_backend
+except ImportError:
+    # psycopg2 нужен только для PostgreSQL; без него тесты пула пропускаются.
+    psycopg2_pool = pool_backend = None
 
 User = get_user_model()
 
@@ -17,3 +48,484 @@ class CoreURLTests(TestCase):
         """Проверка шаблона 403csrf.html"""
         response = self.guest_client.post('/create/')
         self.assertTemplateUsed(response, 'core/403.html')
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_header(self):
+        """Включённая middleware отдаёт время SQL, шаблонов и миниатюр"""
+        response = Client().get('/')
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'queries"', 'tpl;dur=', 'thumb;dur=',
+                       'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIsNone(timing.current())
+
+    def test_disabled(self):
+        """Выключенная middleware не добавляет заголовок"""
+        response = Client().get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING=True, SERVER_TIMING_LOG_MS=0)
+    def test_slow_request_log(self):
+        """Медленный запрос пишется в лог строкой JSON"""
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            Client().get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+
+
+class QueryBudgetHelperTests(TestCase):
+    def test_fingerprint(self):
+        """Слепок запроса не зависит от значений"""
+        self.assertEqual(
+            query_budget.fingerprint(
+                "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'"),
+            query_budget.fingerprint(
+                "SELECT *  FROM t WHERE id IN (7) AND name = 'it''s'"),
+        )
+
+    def test_report_shows_new_and_duplicate_queries(self):
+        """Превышение бюджета показывает новые и повторные запросы"""
+        budget = {'queries': 1, 'fingerprints': ['SELECT ? FROM a']}
+        text = query_budget.report(
+            'view', ['SELECT ? FROM a', 'SELECT ? FROM b',
+                     'SELECT ? FROM b'], budget)
+        self.assertIn('3 запросов при бюджете 1', text)
+        self.assertIn('Новые запросы:\n  SELECT ? FROM b', text)
+        self.assertIn('2x SELECT ? FROM b', text)
+
+
+def compute_in_process(directory):
+    def compute():
+        with open(os.path.join(directory, 'calls'), 'a') as calls:
+            calls.write('1')
+        time.sleep(0.3)
+        return 'страница'
+
+    stampede.get_or_set(
+        'feed', compute, 60, cache=FileBasedCache(directory, {}))
+
+
+def cache_worker(connection):
+    '''Воркер: рендерит «страницу» текущего поколения или сдвигает его.'''
+    for command, value in iter(connection.recv, None):
+        if command == 'bump':
+            caches.bump_generation('tests', 'feed')
+            connection.send(None)
+        else:
+            connection.send(stampede.get_or_set(
+                caches.app_key('tests', 'page'), lambda: value, 60,
+                version=caches.generation('tests', 'feed')))
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.caches = {
+            'locmem': LocMemCache('stampede-tests', {}),
+            'file': FileBasedCache(self.directory, {}),
+        }
+        for backend in self.caches.values():
+            backend.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_single_flight(self):
+        """Одновременные промахи считают значение один раз"""
+        for name, backend in self.caches.items():
+            with self.subTest(cache=name):
+                calls = []
+
+                def compute():
+                    calls.append(1)
+                    time.sleep(0.2)
+                    return 'страница'
+
+                results = []
+                threads = [
+                    threading.Thread(target=lambda: results.append(
+                        stampede.get_or_set(
+                            'feed', compute, 60, cache=backend)))
+                    for _ in range(8)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(results, ['страница'] * 8)
+
+    def test_single_flight_across_processes(self):
+        """Файловый кеш держит замок между процессами"""
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=compute_in_process,
+                            args=(self.directory,))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with open(os.path.join(self.directory, 'calls')) as calls:
+            self.assertEqual(calls.read(), '1')
+
+    def test_stale_while_revalidate(self):
+        """Пока другой пересчитывает, отдаётся прежнее значение"""
+        for name, backend in self.caches.items():
+            with self.subTest(cache=name):
+                backend.set('feed', stampede.Entry(
+                    'старое', 1, time.time() - 1, 0.1), 60)
+                stampede.acquire('feed', cache=backend)
+                value = stampede.get_or_set(
+                    'feed', lambda: 'новое', 60, version=1, cache=backend)
+                self.assertEqual(value, 'старое')
+
+    def test_other_version_is_not_served(self):
+        """Запись другой версии не отдаётся даже как устаревшая"""
+        backend = self.caches['locmem']
+        backend.set('feed', stampede.Entry('старое', 1, None, 0.1), 60)
+        stampede.acquire('feed', lease=1, cache=backend)
+        with mock.patch.object(stampede, 'WAIT_STEP', 0.01):
+            value = stampede.get_or_set(
+                'feed', lambda: 'новое', 60, version=2, lease=0.1,
+                cache=backend)
+        self.assertEqual(value, 'новое')
+
+    def test_waiters_retake_lock_after_failure(self):
+        """Упавший пересчёт не заставляет ждущих ждать всю аренду"""
+        for name, backend in self.caches.items():
+            with self.subTest(cache=name):
+                token = stampede.acquire('feed', cache=backend)
+                calls = []
+
+                def compute():
+                    calls.append(1)
+                    return 'страница'
+
+                results = []
+                threads = [
+                    threading.Thread(target=lambda: results.append(
+                        stampede.get_or_set(
+                            'feed', compute, 60, lease=5, cache=backend)))
+                    for _ in range(4)
+                ]
+                started = time.monotonic()
+                for thread in threads:
+                    thread.start()
+                time.sleep(0.1)
+                # Хозяин замка упал: finally в get_or_set отпустил замок.
+                stampede.release('feed', token, cache=backend)
+                for thread in threads:
+                    thread.join()
+                self.assertLess(time.monotonic() - started, 2)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(results, ['страница'] * 4)
+
+    def test_early_expiration(self):
+        """Долго считавшееся значение обновляется раньше срока"""
+        entry = stampede.Entry('значение', None, time.time() + 5, 10)
+        with mock.patch.object(stampede.random, 'random', return_value=0.5):
+            self.assertFalse(entry.is_fresh(None))
+            self.assertTrue(entry.is_fresh(None, beta=0))
+
+    def test_template_tag(self):
+        """{% stampede_cache %} кеширует фрагмент, как {% cache %}"""
+        cache.clear()
+        template = Template(
+            '{% load stampede_cache %}'
+            '{% stampede_cache 60 fragment name %}{{ value }}'
+            '{% endstampede_cache %}')
+        first = template.render(Context({'name': 'a', 'value': 1}))
+        second = template.render(Context({'name': 'a', 'value': 2}))
+        other = template.render(Context({'name': 'b', 'value': 3}))
+        self.assertEqual((first, second, other), ('1', '1', '3'))
+
+
+class SharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def start_worker(self, context):
+        parent, child = context.Pipe()
+        process = context.Process(target=cache_worker, args=(child,))
+        process.start()
+        self.addCleanup(process.join)
+        self.addCleanup(parent.send, None)
+        return parent
+
+    def call(self, worker, command, value=None):
+        worker.send((command, value))
+        return worker.recv()
+
+    def test_invalidation_across_processes(self):
+        """Сдвиг поколения в одном процессе виден в другом"""
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.directory,
+        }}
+        with override_settings(CACHES=shared):
+            context = multiprocessing.get_context('fork')
+            first = self.start_worker(context)
+            second = self.start_worker(context)
+            self.assertEqual(self.call(first, 'render', 'A'), 'A')
+            self.assertEqual(self.call(second, 'render', 'B'), 'A')
+            self.call(second, 'bump')
+            self.assertEqual(self.call(first, 'render', 'C'), 'C')
+            self.assertEqual(self.call(second, 'render', 'D'), 'C')
+
+    def test_app_keys_do_not_clash(self):
+        """Поколения разных приложений независимы"""
+        cache.clear()
+        posts = caches.generation('posts', 'feed')
+        other = caches.generation('other', 'feed')
+        caches.bump_generation('other', 'feed')
+        self.assertEqual(caches.generation('posts', 'feed'), posts)
+        self.assertNotEqual(caches.generation('other', 'feed'), other)
+
+
+class WarmupTests(SimpleTestCase):
+    def setUp(self):
+        self.loader = engines['django'].engine.template_loaders[0]
+        self.loader.reset()
+
+    def test_templates_compiled(self):
+        """Прогрев кладёт разобранные шаблоны проекта в cached.Loader"""
+        self.assertIsInstance(self.loader, cached.Loader)
+        compiled = warmup.compile_templates()
+        self.assertEqual(compiled, len(warmup.template_names()))
+        for name in ('base.html', 'includes/post_list.html',
+                     'includes/paginator.html', 'posts/index.html'):
+            self.assertIn(name, self.loader.get_template_cache)
+        self.assertFalse(any(
+            name.startswith('admin/')
+            for name in self.loader.get_template_cache))
+
+    def test_broken_template_logged(self):
+        """Неразбираемый шаблон пишется в лог и не мешает прогреву"""
+        names = ['base.html', 'missing.html']
+        with mock.patch.object(warmup, 'template_names', return_value=names):
+            with self.assertLogs('yatube.performance', 'WARNING') as logs:
+                self.assertEqual(warmup.compile_templates(), 1)
+        self.assertIn('missing.html', logs.output[0])
+
+
+class DatabaseConnectionTests(SimpleTestCase):
+    def setUp(self):
+        db.reset()
+
+    def fake_connection(self, usable, health_checks=True):
+        connection = mock.Mock(
+            connection=object(), in_atomic_block=False,
+            settings_dict={'CONN_HEALTH_CHECKS': health_checks})
+        connection.is_usable.return_value = usable
+        return connection
+
+    def test_health_check(self):
+        """Перед запросом закрывается только неживое соединение"""
+        dead = self.fake_connection(usable=False)
+        alive = self.fake_connection(usable=True)
+        unchecked = self.fake_connection(usable=False, health_checks=False)
+        handler = mock.Mock(all=lambda: [dead, alive, unchecked])
+        with mock.patch.object(db, 'connections', handler):
+            db.health_check()
+        dead.close.assert_called_once()
+        alive.close.assert_not_called()
+        unchecked.is_usable.assert_not_called()
+
+    def test_counts_opened_connections(self):
+        """Каждое новое соединение попадает в счётчик"""
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': ':memory:'}, 'counted')
+        wrapper.ensure_connection()
+        wrapper.close()
+        self.assertEqual(db.counters()['connections'], 1)
+
+    @override_settings(DB_CONNECTION_LOG_EVERY=2)
+    def test_log_every_n_requests(self):
+        """Счётчик пишется в лог каждые N запросов и обнуляется"""
+        db.connection_opened(sender=None, connection=None)
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            db.request_done()
+            db.request_done()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('1 на 2 запросов', logs.output[0])
+        self.assertEqual(db.counters(), {'connections': 0, 'requests': 0})
+
+
+@skipIf(pool_backend is None, 'psycopg2 не установлен')
+class PooledBackendTests(SimpleTestCase):
+    """Бэкенд с пулом без сервера PostgreSQL: psycopg2.connect подменён."""
+
+    def setUp(self):
+        db.reset()
+        self.opened = []
+        patcher = mock.patch.object(
+            psycopg2_pool.psycopg2, 'connect', side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(pool_backend._pools.clear)
+
+    def connect(self, *args, **kwargs):
+        raw = mock.MagicMock(closed=0, isolation_level=1)
+        raw.get_parameter_status.return_value = 'UTC'
+        self.opened.append(raw)
+        return raw
+
+    def wrapper(self, max_size=2):
+        return pool_backend.DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'core.backends.postgresql_pool',
+            'NAME': 'yatube', 'HOST': '', 'PORT': '', 'USER': '',
+            'PASSWORD': '', 'OPTIONS': {}, 'TIME_ZONE': None,
+            'POOL': {'MIN_SIZE': 1, 'MAX_SIZE': max_size},
+        }, 'pooled')
+
+    def test_close_returns_connection_to_pool(self):
+        """Закрытие возвращает соединение в пул, а не рвёт его"""
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close.assert_not_called()
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        self.assertEqual(len(self.opened), 1)
+        second.close()
+
+    def test_dead_connection_replaced(self):
+        """Умершее в пуле соединение закрывается и заменяется новым"""
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        dead = wrapper.connection
+        wrapper.close()
+        dead.closed = 2
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, dead)
+        self.assertEqual(len(self.opened), 2)
+        wrapper.close()
+
+    def test_exhausted_pool_raises_database_error(self):
+        """Когда свободных соединений нет, PoolError - ошибка базы"""
+        busy = self.wrapper(max_size=1)
+        busy.ensure_connection()
+        with self.assertRaises(Error):
+            self.wrapper(max_size=1).ensure_connection()
+        busy.close()
+
+    def test_counts_only_opened_connections(self):
+        """Выдача соединения из пула не считается новым соединением"""
+        for _ in range(3):
+            wrapper = self.wrapper()
+            wrapper.ensure_connection()
+            wrapper.close()
+        self.assertEqual(db.counters()['connections'], 1)
+
+
+@override_settings(DB_REPLICA_ALIASES=['replica'], DB_REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    """Реплика - отдельный файл SQLite со своими данными, поэтому по
+    ответу видно, из какой базы прочитаны посты."""
+
+    def setUp(self):
+        cache.clear()
+        routers._down_until.clear()
+        self.dir = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='primary')
+        self.post = Post.objects.create(
+            text='Пост из основной базы', author=self.author)
+
+    def tearDown(self):
+        if 'replica' in connections.databases:
+            connections['replica'].close()
+            del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            delattr(connections._connections, 'replica')
+        routers._down_until.clear()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def add_replica(self, name):
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+
+    def fill_replica(self):
+        self.add_replica(os.path.join(self.dir, 'replica.sqlite3'))
+        with connections['replica'].schema_editor() as editor:
+            for model in (User, Group, Post):
+                editor.create_model(model)
+        User.objects.using('replica').bulk_create(
+            [User(pk=self.author.pk, username='primary')])
+        Post.objects.using('replica').bulk_create([
+            Post(text='Пост из реплики', author_id=self.author.pk)])
+
+    def test_read_view_uses_replica(self):
+        """Лента читается с реплики"""
+        self.fill_replica()
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из реплики')
+        self.assertNotContains(response, 'Пост из основной базы')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент читает свои изменения с default"""
+        self.fill_replica()
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'})
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из основной базы')
+        # Страницу из default привязанный клиент положил в общий кеш.
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Пост из основной базы')
+        cache.clear()
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Пост из реплики')
+
+    def test_pinned_client_skips_stale_page(self):
+        """Привязанный клиент не берёт из кеша страницу с реплики"""
+        self.fill_replica()
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Пост из реплики')
+        client = Client()
+        client.cookies[routers.PIN_COOKIE] = str(time.time() + 5)
+        self.assertContains(
+            client.get(reverse('posts:index')), 'Пост из основной базы')
+
+    def test_database_cache_stays_on_primary(self):
+        """Кеш в базе читается из default и не привязывает клиента"""
+        self.fill_replica()
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'test_cache'}}):
+            call_command('createcachetable', database='default')
+            response = Client().get(reverse('posts:index'))
+            self.assertContains(response, 'Пост из реплики')
+            self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_unavailable_replica(self):
+        """Без доступной реплики чтение идёт в default"""
+        self.add_replica(os.path.join(self.dir, 'missing', 'db.sqlite3'))
+        with self.assertLogs('yatube.performance', 'WARNING'):
+            response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из основной базы')
+        with mock.patch.object(routers, 'connections') as handler:
+            Client().get(reverse('posts:index'))
+        handler.__getitem__.assert_not_called()
+
+    def test_no_migrations_on_replica(self):
+        """Схему на реплику приносит репликация, а не migrate"""
+        router = routers.ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(router.allow_migrate('default', 'posts'))
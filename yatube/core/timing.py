@@ -0,0 +1,84 @@
+'''Замеры времени внутри запроса для заголовка Server-Timing.
+
+Пока ServerTimingMiddleware не включена, замеров нет: timer() видит,
+что собирать некуда, и ничего не делает.
+'''
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    '''Суммарное время и число событий каждого вида за один запрос.'''
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._running = set()
+
+    def add(self, name, seconds):
+        self.seconds[name] += seconds
+        self.counts[name] += 1
+
+    def milliseconds(self, name):
+        return round(self.seconds[name] * 1000, 2)
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    return _current.set(Timings())
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    '''Добавляет время блока к метрике name текущего запроса.
+
+    Вложенные замеры той же метрики (include внутри шаблона) не
+    складываются повторно.
+    '''
+    timings = _current.get()
+    if timings is None or name in timings._running:
+        yield
+        return
+    timings._running.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._running.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    '''execute_wrapper для подключений к базе.'''
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+_templates_instrumented = False
+
+
+def instrument_templates():
+    '''Оборачивает рендер шаблонов Django в timer('tpl').'''
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.base import Template
+    render = Template.render
+
+    def timed_render(self, context):
+        with timer('tpl'):
+            return render(self, context)
+
+    Template.render = timed_render
+    _templates_instrumented = True
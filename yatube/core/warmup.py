@@ -0,0 +1,66 @@
+'''Прогрев процесса: шаблоны проекта и URL-резолвер.
+
+Шаблоны разбираются один раз и остаются в cached.Loader, резолвер
+заполняет свои таблицы для resolve и reverse. Если сервер загружает
+приложение до fork (gunicorn --preload), воркеры получают всё готовым;
+иначе каждый воркер прогревается при старте, до первого запроса.
+'''
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+
+logger = logging.getLogger('yatube.performance')
+
+TEMPLATE_EXTENSIONS: tuple = ('.html', '.txt')
+
+
+def project_template_dirs():
+    '''Каталоги шаблонов проекта, без шаблонов сторонних пакетов.'''
+    dirs = [
+        *settings.TEMPLATES[0]['DIRS'], *get_app_template_dirs('templates')]
+    return [
+        directory for directory in dirs
+        if os.path.abspath(directory).startswith(settings.BASE_DIR)
+    ]
+
+
+def template_names():
+    names = set()
+    for directory in project_template_dirs():
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(TEMPLATE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    names.add(os.path.relpath(path, directory))
+    return sorted(names)
+
+
+def compile_templates():
+    '''Разбирает шаблоны проекта, возвращает их число.'''
+    engine = engines['django']
+    compiled = 0
+    for name in template_names():
+        try:
+            engine.get_template(name.replace(os.sep, '/'))
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            logger.warning('Шаблон %s не разобран: %s', name, error)
+            continue
+        compiled += 1
+    return compiled
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # reverse_dict заполняет таблицы и для resolve, и для reverse.
+    resolver.reverse_dict
+    for namespace in resolver.namespace_dict:
+        resolver.namespace_dict[namespace][1].reverse_dict
+
+
+def warm():
+    compile_templates()
+    warm_urls()
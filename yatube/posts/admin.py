@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Follow, Group, Post
 
 
@@ -11,6 +12,13 @@ class PostAdmin(admin.ModelAdmin):
 
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''Поиск по полнотекстовому индексу вместо LIKE по всем постам.'''
+        if not search_term or search.backend() == 'like':
+            return super().get_search_results(
+                request, queryset, search_term)
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
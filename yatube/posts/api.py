@@ -0,0 +1,133 @@
+'''JSON API только для чтения: те же ленты и пост, что и в posts.views.
+
+Страницы лент листаются курсором (?after=, ?before=), ?fields=
+оставляет в постах только нужные поля. Комментарии поста тоже идут
+страницами: первая - вместе с постом, следующие - по comments_next из
+posts/<id>/comments/?after=. Ответы кешируются и
+проверяются ETag по тем же поколениям, что и HTML-страницы, поэтому
+сбрасываются теми же сигналами.
+'''
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from core import routers, stampede
+from core.routers import read_replica
+
+from . import serializers, timeline
+from .caching import feed_page_key, feed_timeout, feed_version
+from .conditional import (conditional, feed_validators, follow_validators,
+                          post_validators, profile_validators)
+from .models import Group, Post
+from .paginators import CursorPaginator, TimelinePaginator
+from .views import NUM_POSTS_NEED, comments_page
+
+User = get_user_model()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        json.dumps(data, ensure_ascii=False),
+        content_type='application/json', status=status)
+
+
+def api_view(view):
+    '''Ошибки API - тоже JSON, а не HTML-страницы.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            fields = serializers.parse_fields(request.GET.get('fields'))
+        except serializers.UnknownFields as error:
+            return json_response(
+                {'detail': f'Неизвестные поля: {error}'}, status=400)
+        try:
+            return view(request, fields, *args, **kwargs)
+        except Http404:
+            return json_response({'detail': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def feed_response(request, fields, feed, vary_on, posts,
+                  paginator_class=CursorPaginator, **extra):
+    '''Страница ленты: посты из кеша, остальное - свежее.'''
+    def build():
+        page = paginator_class(posts, NUM_POSTS_NEED).get_cursor_page(
+            request.GET.get('after'), request.GET.get('before'))
+        return serializers.serialize_page(page, fields)
+
+    key = feed_page_key(
+        feed, [*vary_on, 'json', ','.join(fields)], request)
+    cached = stampede.refresh if routers.pinned() else stampede.get_or_set
+    data = cached(
+        key, build, feed_timeout(feed), version=feed_version(feed, vary_on))
+    return json_response({**extra, **data})
+
+
+@read_replica
+@conditional(feed_validators)
+@api_view
+def index(request, fields):
+    return feed_response(
+        request, fields, 'index', (), Post.objects.for_feed())
+
+
+@read_replica
+@conditional(feed_validators)
+@api_view
+def group_posts(request, fields, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, fields, 'group_list', (group.pk,),
+        group.posts.for_feed(), group=serializers.serialize_group(group))
+
+
+@read_replica
+@conditional(profile_validators)
+@api_view
+def profile(request, fields, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    return feed_response(
+        request, fields, 'profile', (author.pk,), author.posts.for_feed(),
+        author=serializers.serialize_author(author))
+
+
+@read_replica
+@conditional(post_validators)
+@api_view
+def post_detail(request, fields, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    page = comments_page(request, post.pk)
+    return json_response({
+        **serializers.serialize(post, fields),
+        'comments': [
+            serializers.serialize_comment(comment) for comment in page],
+        'comments_next': page.next_cursor if page.has_next() else None,
+    })
+
+
+@read_replica
+@conditional(post_validators)
+@api_view
+def post_comments(request, fields, post_id):
+    '''Страница комментариев поста; ?fields= здесь не применяется.'''
+    page = comments_page(request, post_id)
+    if not page and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return json_response(serializers.serialize_page(
+        page, serializers.COMMENT_FIELDS, serializers.COMMENT_FIELDS))
+
+
+@read_replica
+@conditional(follow_validators)
+@api_view
+def follow_index(request, fields):
+    if not request.user.is_authenticated:
+        return json_response(
+            {'detail': 'Нужна авторизация'}, status=401)
+    return feed_response(
+        request, fields, 'follow', (request.user.pk,),
+        timeline.feed_for(request.user).for_feed(), TimelinePaginator)
@@ -0,0 +1,118 @@
+'''Кеш страниц лент с поколениями и кеш карточек постов.
+
+Запись страницы хранит номера поколений данных как версию, поэтому
+закешированная страница живёт, пока данные не изменились: сигналы
+сохранения и удаления постов, комментариев, групп и подписок сдвигают
+поколение, и записи прежней версии перестают отдаваться. Пересчёт
+страницы защищён от одновременных повторов core.stampede.
+
+Карточка поста кешируется отдельно от лент и общая для всех лент. Её
+запись хранит отпечаток всего, что карточка выводит (card_version), и
+при несовпадении с загруженным постом перерисовывается. Сигналы правки
+поста и переименования группы или автора удаляют записи сразу.
+'''
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import caches
+
+APP_LABEL: str = 'posts'
+POSTS_SCOPE: str = 'posts'
+PAGE_KEY: str = 'feed:page:{}:{}'
+PAGE_PARAMS: tuple = ('page', 'after', 'before')
+CARD_KEY: str = 'post:card:{}:{}'
+# Варианты карточки: со ссылкой на группу (g) и на профиль автора (p).
+CARD_VARIANTS: tuple = ('', 'g', 'p', 'gp')
+DROP_BATCH: int = 1000
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def author_scope(user_id):
+    '''Подписчики автора: от них зависят счётчики в профиле.'''
+    return f'author:{user_id}'
+
+
+def generation(scope):
+    return caches.generation(APP_LABEL, scope)
+
+
+def bump_generation(scope):
+    caches.bump_generation(APP_LABEL, scope)
+
+
+def changed_at(*scopes):
+    return caches.changed_at(APP_LABEL, *scopes)
+
+
+def feed_scopes(feed, *vary_on):
+    '''Поколения, от которых зависит страница ленты.'''
+    if feed == 'follow':
+        return (POSTS_SCOPE, *(follow_scope(user_id) for user_id in vary_on))
+    return (POSTS_SCOPE,)
+
+
+def feed_timeout(feed):
+    return settings.FEED_CACHE_TIMEOUTS.get(
+        feed, settings.FEED_CACHE_TIMEOUTS['default'])
+
+
+def page_token(request):
+    '''Номер страницы или курсор из запроса.'''
+    if request is None:
+        return ''
+    return '&'.join(
+        f'{name}={request.GET[name]}'
+        for name in PAGE_PARAMS if name in request.GET
+    )
+
+
+def feed_version(feed, vary_on):
+    '''Поколения данных, из которых собрана страница ленты.'''
+    return tuple(
+        generation(scope) for scope in feed_scopes(feed, *vary_on))
+
+
+def feed_page_key(feed, vary_on, request):
+    '''Ключ страницы; поколения хранятся в записи как её версия.'''
+    parts = [*vary_on, page_token(request)]
+    digest = hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return caches.app_key(APP_LABEL, PAGE_KEY.format(feed, digest))
+
+
+def card_variant(group_link, profile_link):
+    return ('g' if group_link else '') + ('p' if profile_link else '')
+
+
+def card_key(post_id, variant):
+    return caches.app_key(APP_LABEL, CARD_KEY.format(post_id, variant))
+
+
+def card_version(post):
+    '''Отпечаток полей, которые выводит includes/post_list.html.'''
+    parts = (
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name or '',
+        post.author.username,
+        post.group.slug if post.group_id else '',
+    )
+    return hashlib.md5('\0'.join(parts).encode()).hexdigest()
+
+
+def drop_cards(post_ids):
+    '''Удаляет карточки постов во всех вариантах.'''
+    keys = []
+    for post_id in post_ids:
+        keys.extend(card_key(post_id, variant) for variant in CARD_VARIANTS)
+        if len(keys) >= DROP_BATCH:
+            cache.delete_many(keys)
+            keys = []
+    if keys:
+        cache.delete_many(keys)
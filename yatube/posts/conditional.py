@@ -0,0 +1,134 @@
+'''Условные GET-запросы к лентам и странице поста.
+
+Валидаторы страницы - ETag и Last-Modified - считаются из поколений
+кеша лент (caching.generation), даты публикации поста и времени
+последнего комментария. Если клиент прислал совпадающие If-None-Match
+или If-Modified-Since, condition() отвечает 304 до вызова представления:
+посты не загружаются и шаблоны не рендерятся. На вычисление уходит не
+больше одного лёгкого запроса к базе.
+
+Страница зависит и от пользователя (шапка, кнопки подписки и
+редактирования), поэтому его id входит в ETag, а для вошедшего - и
+CSRF-cookie: токен в формах меняется при каждом входе. Last-Modified
+вошедшему не отдаётся, дата о смене токена не знает. Поколения сверяются,
+только если кеш общий для всех процессов (settings.CACHE_SHARED).
+'''
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Comment, Post
+
+User = get_user_model()
+
+
+def make_etag(request, *parts):
+    parts = (request.get_full_path(), request.user.pk, *parts)
+    if request.user.is_authenticated:
+        # В формах страницы пользователя - CSRF-токен, а он меняется при
+        # каждом входе: старая страница после нового входа не годится.
+        parts += (request.COOKIES.get(settings.CSRF_COOKIE_NAME),)
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def scope_validators(request, scopes, *parts):
+    generations = [caching.generation(scope) for scope in scopes]
+    return (
+        make_etag(request, *parts, *generations),
+        caching.changed_at(*scopes),
+    )
+
+
+def user_scopes(request):
+    if request.user.is_authenticated:
+        return (caching.follow_scope(request.user.pk),)
+    return ()
+
+
+def feed_validators(request, slug=None):
+    '''Главная и группа: без запросов к базе.'''
+    return scope_validators(request, (caching.POSTS_SCOPE,))
+
+
+def follow_validators(request):
+    '''Лента подписок: посты и подписки самого пользователя.'''
+    if not request.user.is_authenticated:
+        return None, None
+    return scope_validators(
+        request, (caching.POSTS_SCOPE, *user_scopes(request)))
+
+
+def profile_validators(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None, None
+    scopes = (
+        caching.POSTS_SCOPE,
+        caching.author_scope(author_id),
+        *user_scopes(request),
+    )
+    return scope_validators(request, scopes)
+
+
+def post_validators(request, post_id):
+    '''Дата поста и последнего комментария одним запросом.'''
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')).order_by('-created').values('created')[:1]
+    dates = (
+        Post.objects.filter(pk=post_id)
+        .annotate(last_comment=Subquery(last_comment))
+        .values_list('pub_date', 'last_comment').first()
+    )
+    if dates is None:
+        return None, None
+    pub_date, last_comment = dates
+    etag, changed = scope_validators(
+        request, (caching.POSTS_SCOPE,), pub_date, last_comment)
+    last_modified = max(
+        date for date in (pub_date, last_comment, changed) if date)
+    return etag, last_modified
+
+
+def conditional(validators):
+    '''condition(), который считает валидаторы один раз на запрос.
+
+    Без общего кеша (settings.CACHE_SHARED) поколения у каждого процесса
+    свои, и 304 мог бы подтвердить устаревшую страницу, поэтому
+    валидаторы не считаются вовсе. Ответ с ошибкой - 404 отсутствующей
+    группы, 401 API - уходит без ETag и Last-Modified.
+    '''
+    def cached(request, *args, **kwargs):
+        if not hasattr(request, '_validators'):
+            etag, last_modified = (
+                validators(request, *args, **kwargs)
+                if settings.CACHE_SHARED else (None, None))
+            if request.user.is_authenticated:
+                # Дата не знает о смене CSRF-токена: только ETag.
+                last_modified = None
+            request._validators = etag, last_modified
+        return request._validators
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda *args, **kwargs: cached(*args, **kwargs)[0],
+            last_modified_func=(
+                lambda *args, **kwargs: cached(*args, **kwargs)[1]),
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code >= 400:
+                del response['ETag']
+                del response['Last-Modified']
+            return response
+        return wrapper
+    return decorator
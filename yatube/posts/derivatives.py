@@ -0,0 +1,176 @@
+'''Адаптивные копии картинок постов для <img srcset>.
+
+Для каждой картинки обработчик очереди делает копии нескольких ширин
+из settings.POST_IMAGE_WIDTHS в WebP и в исходном формате. Копии
+обрезаются под пропорции карточки поста и лежат рядом с оригиналом:
+posts/cat.jpg -> posts/cat.w320.webp, posts/cat.w320.jpg, ...
+Список готовых копий хранится в задаче ThumbnailTask.variants.
+'''
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from core.caches import app_key
+
+from .models import ThumbnailTask
+
+EXTENSIONS: dict = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+QUALITY: int = 80
+# Сколько секунд помнить, что копий ещё нет, чтобы не ходить в базу
+# на каждом показе картинки из очереди.
+NOT_READY_TIMEOUT: int = 30
+CACHE_KEY: str = 'post-image:derivatives:{}'
+
+
+def webp_supported():
+    return features.check('webp')
+
+
+def _fallback_format(image):
+    '''Исходный формат, если браузеры его понимают, иначе PNG.'''
+    if image.format in ('JPEG', 'PNG'):
+        return image.format
+    return 'PNG'
+
+
+def derivative_name(name, width, image_format):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.w{width}.{EXTENSIONS[image_format]}'
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _store(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content))
+
+
+def generate(name):
+    '''Делает копии картинки, возвращает их список для srcset.'''
+    card_width, card_height = settings.POST_IMAGE_ASPECT
+    with default_storage.open(name) as source_file:
+        source = Image.open(source_file)
+        source.load()
+    formats = [_fallback_format(source)]
+    if webp_supported():
+        formats.append('WEBP')
+    variants = []
+    for width in settings.POST_IMAGE_WIDTHS:
+        height = round(width * card_height / card_width)
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for image_format in formats:
+            content = _encode(resized, image_format)
+            stored = _store(
+                derivative_name(name, width, image_format), content)
+            variants.append({
+                'name': stored,
+                'width': width,
+                'format': image_format,
+                'size': len(content),
+            })
+    return variants
+
+
+def delete(name, variants):
+    for variant in variants:
+        default_storage.delete(variant['name'])
+
+
+def forget(name):
+    '''Сбрасывает закешированный ответ ready_derivatives.
+
+    Вызывается после коммита задачи: если сбросить раньше, читатель
+    успеет закешировать прежнее состояние задачи.
+    '''
+    cache.delete(_cache_key(name))
+
+
+def _cache_key(name):
+    return app_key(
+        'posts', CACHE_KEY.format(hashlib.md5(name.encode()).hexdigest()))
+
+
+class Derivatives:
+    '''Готовые копии одной картинки в виде атрибутов для <picture>.'''
+
+    def __init__(self, variants):
+        self.variants = variants
+        self.fallback = [v for v in variants if v['format'] != 'WEBP']
+        self.webp = [v for v in variants if v['format'] == 'WEBP']
+
+    @staticmethod
+    def _srcset(variants):
+        return ', '.join(
+            f'{default_storage.url(v["name"])} {v["width"]}w'
+            for v in variants
+        )
+
+    @property
+    def srcset(self):
+        return self._srcset(self.fallback)
+
+    @property
+    def webp_srcset(self):
+        return self._srcset(self.webp)
+
+    @property
+    def src(self):
+        return default_storage.url(self.fallback[-1]['name'])
+
+    def __bool__(self):
+        return bool(self.fallback)
+
+
+def _derivatives(variants):
+    if not variants:
+        return None
+    return Derivatives(json.loads(variants)) or None
+
+
+def ready_many(names):
+    '''Готовые копии пачки картинок: {имя: Derivatives или None}.
+
+    Кеш читается одним get_many, а промахи - одним запросом к задачам,
+    поэтому страница ленты не делает запроса на каждую картинку.
+    '''
+    keys = {name: _cache_key(name) for name in names}
+    cached = cache.get_many(list(keys.values()))
+    missing = [name for name, key in keys.items() if key not in cached]
+    if missing:
+        done = dict(
+            ThumbnailTask.objects.filter(
+                image__in=missing, status=ThumbnailTask.DONE)
+            .values_list('image', 'variants')
+        )
+        ready, waiting = {}, {}
+        for name in missing:
+            variants = done.get(name) or ''
+            (ready if variants else waiting)[keys[name]] = variants
+        if ready:
+            cache.set_many(ready, None)
+        if waiting:
+            cache.set_many(waiting, NOT_READY_TIMEOUT)
+        cached.update(ready)
+        cached.update(waiting)
+    return {name: _derivatives(cached[key]) for name, key in keys.items()}
+
+
+def ready_derivatives(image):
+    '''Готовые копии картинки или None, пока обработчик их не сделал.'''
+    return ready_many([image.name])[image.name]
@@ -0,0 +1,68 @@
+'''Потоковая выгрузка постов, комментариев, групп и подписок.
+
+Строки читаются через iterator(chunk_size=...) - в PostgreSQL это
+серверный курсор - и сразу превращаются в строки NDJSON или CSV, так
+что память не зависит от размера таблицы. Выгрузка идёт по возрастанию
+id, и её можно продолжить с места обрыва: start - первый id, end -
+последний.
+'''
+import csv
+import json
+from datetime import datetime
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE: int = 2000
+FORMATS: tuple = ('ndjson', 'csv')
+TABLES: dict = {
+    'posts': (
+        Post, ('id', 'text', 'pub_date', 'author_id', 'group_id', 'image')),
+    'comments': (
+        Comment, ('id', 'post_id', 'author_id', 'text', 'created')),
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+CONTENT_TYPES: dict = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def rows(table, start=None, end=None, chunk_size=CHUNK_SIZE):
+    '''Кортежи значений полей TABLES[table] по возрастанию id.'''
+    model, fields = TABLES[table]
+    queryset = model.objects.order_by('pk')
+    if start is not None:
+        queryset = queryset.filter(pk__gte=start)
+    if end is not None:
+        queryset = queryset.filter(pk__lte=end)
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        yield tuple(_plain(value) for value in row)
+
+
+class _Line:
+    '''Файл для csv.writer, который возвращает записанную строку.'''
+
+    def write(self, value):
+        return value
+
+
+def lines(table, format='ndjson', start=None, end=None,
+          chunk_size=CHUNK_SIZE):
+    '''Строки выгрузки с переводом строки в конце каждой.'''
+    fields = TABLES[table][1]
+    records = rows(table, start, end, chunk_size)
+    if format == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(fields)
+        for record in records:
+            yield writer.writerow(record)
+        return
+    for record in records:
+        yield json.dumps(dict(zip(fields, record)), ensure_ascii=False) + '\n'
@@ -0,0 +1,147 @@
+'''Счётчик ссылок постов на файлы картинок.
+
+Один файл в хранилище с адресацией по содержимому может принадлежать
+нескольким постам. StoredImage.refs считает их, и файл вместе с его
+миниатюрами удаляется только после того, как ушла последняя ссылка.
+'''
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import caching
+from .models import Post, StoredImage, ThumbnailTask
+from .storage import content_hash, hashed_name, is_hashed, post_image_storage
+from .thumbnails import delete_thumbnails, enqueue
+
+BATCH_SIZE: int = 500
+
+
+def _size(name):
+    '''Размер файла или None, если его нет в хранилище.'''
+    try:
+        return post_image_storage.size(name)
+    except (OSError, SuspiciousFileOperation):
+        return None
+
+
+def acquire(name):
+    '''Новая ссылка поста на файл картинки.'''
+    if not name:
+        return
+    if StoredImage.objects.filter(name=name).update(refs=F('refs') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(
+                name=name,
+                size=_size(name) or 0,
+                refs=1,
+            )
+    except IntegrityError:
+        # Запись успел создать параллельный запрос с той же картинкой.
+        StoredImage.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    '''Пост больше не ссылается на файл.'''
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    transaction.on_commit(lambda: delete_if_unused(name))
+
+
+def delete_if_unused(name):
+    '''Удаляет файл без ссылок, возвращает освобождённые байты.'''
+    deleted, _ = StoredImage.objects.filter(name=name, refs=0).delete()
+    if not deleted:
+        return 0
+    size = _size(name)
+    if size is None:
+        size = 0
+    else:
+        post_image_storage.delete(name)
+    for task in ThumbnailTask.objects.filter(image=name):
+        delete_thumbnails(task)
+    return size
+
+
+def recount(batch_size=BATCH_SIZE):
+    '''Пересобирает StoredImage по текущим ссылкам постов.
+
+    Размер файла читается только для новых имён, записи вставляются,
+    обновляются и удаляются пачками.
+    '''
+    refs = dict(
+        Post.objects.exclude(image='').order_by().values_list('image')
+        .annotate(refs=Count('pk')).values_list('image', 'refs')
+    )
+    stored = {image.name: image for image in StoredImage.objects.all()}
+    stale = [image.pk for name, image in stored.items() if name not in refs]
+    for start in range(0, len(stale), batch_size):
+        StoredImage.objects.filter(
+            pk__in=stale[start:start + batch_size]).delete()
+    changed, added = [], []
+    for name, count in refs.items():
+        image = stored.get(name)
+        if image is not None:
+            if image.refs != count:
+                image.refs = count
+                changed.append(image)
+            continue
+        size = _size(name)
+        if size is not None:
+            added.append(StoredImage(name=name, refs=count, size=size))
+    StoredImage.objects.bulk_update(changed, ['refs'], batch_size=batch_size)
+    StoredImage.objects.bulk_create(added, batch_size=batch_size)
+
+
+def moved_images(post_ids):
+    '''Посты ссылаются на новый файл: кеши со старым устарели.'''
+    caching.drop_cards(post_ids)
+    caching.bump_generation(caching.POSTS_SCOPE)
+
+
+def dedupe(dry_run=False):
+    '''Переносит старые картинки в хранилище по содержимому.
+
+    Одинаковые файлы сливаются в один, посты переключаются на него.
+    Возвращает число перенесённых файлов и освобождённые байты.
+    '''
+    names = (
+        Post.objects.exclude(image='')
+        .values_list('image', flat=True).distinct().order_by('image')
+    )
+    moved = reclaimed = 0
+    targets = set()
+    for name in names:
+        size = _size(name)
+        if is_hashed(name) or size is None:
+            continue
+        with post_image_storage.open(name) as content:
+            target = hashed_name(name, content_hash(content))
+            duplicate = (
+                target in targets or post_image_storage.exists(target))
+            targets.add(target)
+            if not dry_run and not duplicate:
+                post_image_storage.save(name, content)
+        moved += 1
+        if duplicate:
+            reclaimed += size
+        if dry_run:
+            continue
+        with transaction.atomic():
+            posts = Post.objects.filter(image=name)
+            post_ids = list(posts.values_list('pk', flat=True))
+            posts.update(image=target)
+            for task in ThumbnailTask.objects.filter(image=name):
+                delete_thumbnails(task)
+            # update() не шлёт сигналов: карточки и страницы лент со
+            # старым файлом сбрасываем сами, до удаления файла.
+            transaction.on_commit(lambda ids=post_ids: moved_images(ids))
+        post_image_storage.delete(name)
+        enqueue(File(None, target))
+    if not dry_run:
+        recount()
+    return moved, reclaimed
@@ -0,0 +1,35 @@
+'''Пересборка производных данных после массовой вставки.
+
+bulk_create не вызывает сигналы, поэтому после seed_bench и
+bulk_import счётчики, ленты подписок, поисковый индекс и учёт картинок
+пересобираются. Пересобирается только то, что зависит от вставленных
+таблиц, и всё - запросами на множество строк, а не по строке.
+'''
+from . import caching, images, search, stats, thumbnails, timeline
+
+# Счётчики UserStats, которые меняет вставка в таблицу.
+TABLE_STATS: dict = {
+    'posts': ('posts_count',),
+    'comments': ('comments_count',),
+    'follows': ('followers_count', 'following_count'),
+}
+
+
+def rebuild_derived(tables=tuple(TABLE_STATS)):
+    '''Пересобирает то, что обычно поддерживают сигналы, для tables.
+
+    posts - счётчики, ленты, поиск и картинки; comments - счётчики
+    пользователей и постов; follows - счётчики и ленты.
+    '''
+    fields = tuple(
+        field for table in tables for field in TABLE_STATS[table])
+    stats.reconcile(fields=fields)
+    if 'comments' in tables:
+        stats.reconcile_comments()
+    if 'posts' in tables or 'follows' in tables:
+        timeline.fill()
+    if 'posts' in tables:
+        search.rebuild()
+        images.recount()
+        thumbnails.enqueue_missing()
+    caching.bump_generation(caching.POSTS_SCOPE)
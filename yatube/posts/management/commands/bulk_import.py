@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from posts import importing, maintenance
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты, комментарии или подписки из NDJSON или CSV '
+            'пачками через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=importing.TABLES)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='По умолчанию по расширению файла')
+        parser.add_argument(
+            '--batch-size', type=int, default=importing.BATCH_SIZE,
+            help='Строк в одном INSERT')
+        parser.add_argument(
+            '--chunk-size', type=int, default=importing.CHUNK_SIZE,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--start-line', type=int, default=0,
+            help='Продолжить после этой строки файла')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать в конце счётчики, ленты и поиск, '
+                 'зависящие от таблицы')
+
+    def handle(self, *args, **options):
+        importer = importing.Importer(
+            options['table'], options['batch_size'], options['chunk_size'],
+            progress=self.stderr.write)
+        summary = importer.run(
+            importing.read(options['path'], options['format']),
+            options['start_line'])
+        for number, error in importer.errors[:20]:
+            self.stderr.write(f'Строка {number}: {error}')
+        if not options['no_rebuild']:
+            maintenance.rebuild_derived((options['table'],))
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {summary["rows"]}, принято: {summary["accepted"]}, '
+            f'пропущено повторов: {summary["skipped"]}, '
+            f'с ошибками: {summary["invalid"]}, '
+            f'{summary["rows_per_second"]} строк/с'))
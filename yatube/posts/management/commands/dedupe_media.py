@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище по содержимому '
+            'и удаляет дубликаты')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        moved, reclaimed = images.dedupe(dry_run=options['dry_run'])
+        prefix = 'Можно освободить' if options['dry_run'] else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов перенесено: {moved}. {prefix} байт: {reclaimed}'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии, группы или подписки в NDJSON '
+            'или CSV, не загружая таблицу в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=tuple(export.TABLES))
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument(
+            '--start', type=int, help='Первый id, чтобы продолжить выгрузку')
+        parser.add_argument('--end', type=int, help='Последний id')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE)
+        parser.add_argument(
+            '--output', help='Файл; по умолчанию стандартный вывод')
+
+    def handle(self, *args, **options):
+        lines = export.lines(
+            options['table'], options['format'], options['start'],
+            options['end'], options['chunk_size'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка {options["table"]} записана в {options["output"]}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        count = timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, обработано подписок: {count}'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики пользователей и комментариев постов '
+        'и исправляет расхождения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=stats.BATCH_SIZE,
+            help='Сколько пользователей пересчитывать за раз',
+        )
+
+    def handle(self, *args, **options):
+        fixed = stats.reconcile(batch_size=options['batch_size'])
+        fixed += stats.reconcile_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики выровнены, исправлено записей: {fixed}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает раскладку в ленты авторам, у которых подписчиков '
+        'стало меньше порога; запускается по расписанию'
+    )
+
+    def handle(self, *args, **options):
+        count = timeline.resume_fan_out()
+        self.stdout.write(self.style.SUCCESS(
+            f'Раскладка возвращена авторам: {count}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов из очереди задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза между проверками пустой очереди, секунды',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=thumbnails.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        thumbnails.work(
+            sleep=options['sleep'],
+            once=options['once'],
+            batch_size=options['batch_size'],
+        )
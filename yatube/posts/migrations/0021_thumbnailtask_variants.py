@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_thumbnailtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailtask',
+            name='variants',
+            field=models.TextField(blank=True, help_text='JSON-список копий картинки для srcset', verbose_name='Адаптивные копии'),
+        ),
+    ]
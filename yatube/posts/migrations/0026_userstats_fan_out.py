@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_heavy_authors(apps, schema_editor):
+    '''Авторы выше лимита уже читались без раскладки.'''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if limit:
+        UserStats = apps.get_model('posts', 'UserStats')
+        UserStats.objects.filter(
+            followers_count__gt=limit).update(fan_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fan_out',
+            field=models.BooleanField(default=True, verbose_name='Раскладка в ленты'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(condition=models.Q(fan_out=False), fields=['followers_count'], name='stats_no_fan_out_idx'),
+        ),
+        migrations.RunPython(mark_heavy_authors, migrations.RunPython.noop),
+    ]
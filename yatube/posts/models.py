@@ -1,8 +1,16 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 NUM_TASK: int = 15
+# Колонки, которые выводят ленты и страница поста.
+FEED_FIELDS: tuple = (
+    'text', 'pub_date', 'image', 'comments_count',
+    'author', 'author__username',
+    'group', 'group__slug', 'group__title',
+)
 
 
 class Group(models.Model):
@@ -19,6 +27,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        '''Посты для вывода: автор и группа приходят тем же запросом.'''
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+    def with_author_stats(self):
+        '''Счётчики автора без отдельных COUNT-запросов.'''
+        return self.select_related('author__stats').only(
+            *FEED_FIELDS, 'author__stats__posts_count')
+
+
 class Post(models.Model):
     text = models.TextField('Содержание')
     pub_date = models.DateTimeField(
@@ -40,24 +59,46 @@ class Post(models.Model):
     image = models.ImageField(
         'картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    # Поддерживается сигналами комментариев, выравнивается
+    # stats.reconcile_comments.
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'), name='post_author_date_idx'),
+            models.Index(
+                fields=('group', '-pub_date'), name='post_group_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:NUM_TASK]
 
 
+class CommentQuerySet(models.QuerySet):
+    def for_feed(self):
+        '''Комментарии для вывода: автор приходит тем же запросом.'''
+        return self.select_related('author').only(
+            'text', 'created', 'post', 'author', 'author__username')
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        # Поиск по посту обслуживает индекс (post, created).
+        db_index=False,
         related_name='comments')
     author = models.ForeignKey(
         User,
@@ -67,24 +108,34 @@ class Comment(models.Model):
     text = models.TextField('Содержание')
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
-        ordering = ('-post',)
+        ordering = ('created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'),
+        )
 
     def __str__(self):
         return self.text
 
 
 class Follow(models.Model):
+    # Отдельные индексы внешних ключей не нужны: их заменяют
+    # составные (user, author) и (author, user).
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='follower',
         verbose_name='Подпищек')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='following',
         verbose_name='Автор')
 
@@ -92,6 +143,133 @@ class Follow(models.Model):
         ordering = ('-author',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'),
+        )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'),
+        )
 
     def __str__(self):
         return f'Подпищек - {self.user}, автор - {self.author}'
+
+
+class TimelineEntry(models.Model):
+    '''Запись материализованной ленты подписок пользователя.'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост')
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'), name='timeline_user_date_idx'),
+        )
+
+    def __str__(self):
+        return f'Лента {self.user} - пост {self.post_id}'
+
+
+class UserStats(models.Model):
+    '''Денормализованные счётчики пользователя.'''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    # False - посты автора не раскладываются по лентам, а подмешиваются
+    # при чтении (posts.timeline).
+    fan_out = models.BooleanField('Раскладка в ленты', default=True)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+        indexes = (
+            # Авторы без раскладки: их немного, а resume_fan_out ищет
+            # среди них опустившихся ниже порога.
+            models.Index(
+                fields=('followers_count',), name='stats_no_fan_out_idx',
+                condition=models.Q(fan_out=False)),
+        )
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class ThumbnailTask(models.Model):
+    '''Задача фоновой подготовки миниатюр картинки.'''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'В работе'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    image = models.CharField('Картинка', max_length=255, unique=True)
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    variants = models.TextField(
+        'Адаптивные копии',
+        blank=True,
+        help_text='JSON-список копий картинки для srcset')
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+    updated = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'Задача миниатюр'
+        verbose_name_plural = 'Задачи миниатюр'
+
+    def __str__(self):
+        return f'{self.image} - {self.status}'
+
+
+class StoredImage(models.Model):
+    '''Файл картинки и число постов, которые на него ссылаются.'''
+    name = models.CharField('Файл', max_length=255, unique=True)
+    size = models.PositiveIntegerField('Размер, байт', default=0)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
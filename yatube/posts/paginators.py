@@ -0,0 +1,187 @@
+'''Постраничный вывод лент по курсору (pub_date, id).
+
+Следующая страница выбирается условием «старше последнего показанного
+поста», поэтому ни COUNT(*), ни OFFSET не нужны и глубокие страницы
+стоят столько же, сколько первая.
+'''
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR: str = '|'
+ELLIPSIS: str = '…'
+
+
+def elided_page_range(page, on_each_side=2, on_ends=1):
+    '''Номера страниц для ссылок: края и окно вокруг текущей.
+
+    Вместо всех num_pages номеров - не больше 2 * (on_each_side +
+    on_ends) + 3 элементов, пропуски обозначены ELLIPSIS.
+    '''
+    num_pages = page.paginator.num_pages
+    number = page.number
+    if num_pages <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
+
+
+def detach(page):
+    '''Страница без ссылки на запрос: её можно положить в кеш.
+
+    Посты страницы уже загружены, а число страниц у обычного Paginator
+    посчитано при выборе страницы, поэтому сам запрос ей не нужен.
+    '''
+    page.object_list = list(page.object_list)
+    page.paginator.object_list = None
+    return page
+
+
+def pack_cursor(value, pk):
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(token):
+    '''Возвращает (строка, id) или None для испорченного курсора.'''
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().rsplit(CURSOR_SEPARATOR, 1)
+        return value, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_cursor(post):
+    return pack_cursor(post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    '''Возвращает (pub_date, id) или None для испорченного курсора.'''
+    unpacked = unpack_cursor(token)
+    if unpacked is None:
+        return None
+    pub_date = parse_datetime(unpacked[0])
+    if pub_date is None:
+        return None
+    return pub_date, unpacked[1]
+
+
+class CursorPaginator(Paginator):
+    '''Paginator без COUNT(*) и OFFSET.
+
+    Номер страницы и число страниц здесь условные: их ровно столько,
+    чтобы has_next/has_previous у обычного Page работали, как прежде.
+    Ссылки на соседние страницы строятся из next_cursor/previous_cursor.
+    '''
+    is_cursor = True
+    date_field = 'pub_date'
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page)
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + int(self._has_next)
+
+    def encode(self, post):
+        return pack_cursor(
+            getattr(post, self.date_field).isoformat(), post.pk)
+
+    def decode(self, token):
+        return decode_cursor(token)
+
+    def first(self, limit):
+        field = self.date_field
+        return list(self.object_list.order_by(f'-{field}', '-pk')[:limit])
+
+    def older(self, key, limit):
+        '''Посты после курсора в порядке ленты.'''
+        field, (pub_date, pk) = self.date_field, key
+        return list(self.object_list.filter(
+            Q(**{f'{field}__lt': pub_date})
+            | Q(**{field: pub_date, 'pk__lt': pk})
+        ).order_by(f'-{field}', '-pk')[:limit])
+
+    def newer(self, key, limit):
+        '''Посты перед курсором, ближайшие первыми.'''
+        field, (pub_date, pk) = self.date_field, key
+        return list(self.object_list.filter(
+            Q(**{f'{field}__gt': pub_date})
+            | Q(**{field: pub_date, 'pk__gt': pk})
+        ).order_by(field, 'pk')[:limit])
+
+    def get_cursor_page(self, after=None, before=None):
+        '''Страница после курсора after или перед курсором before.'''
+        per_page = self.per_page
+        after, before = self.decode(after), self.decode(before)
+        if before is not None:
+            posts = self.newer(before, per_page + 1)
+            has_previous = len(posts) > per_page
+            posts = posts[:per_page][::-1]
+            has_next = True
+        else:
+            if after is not None:
+                posts = self.older(after, per_page + 1)
+            else:
+                posts = self.first(per_page + 1)
+            has_next = len(posts) > per_page
+            posts = posts[:per_page]
+            has_previous = after is not None
+        if not posts and (after or before):
+            return self.get_cursor_page()
+        self._number = 2 if has_previous else 1
+        self._has_next = has_next and bool(posts)
+        page = Page(posts, self._number, self)
+        page.next_cursor = self.encode(posts[-1]) if posts else ''
+        page.previous_cursor = self.encode(posts[0]) if posts else ''
+        return page
+
+
+class TimelinePaginator(CursorPaginator):
+    '''Лента подписок: курсор по дате записи ленты из timeline.feed_for.'''
+    date_field = 'feed_date'
+
+
+class CommentPaginator(CursorPaginator):
+    '''Комментарии поста по курсору (created, id), старые первыми.
+
+    after ведёт к более поздним комментариям, before - к более ранним.
+    '''
+
+    def encode(self, comment):
+        return pack_cursor(comment.created.isoformat(), comment.pk)
+
+    def first(self, limit):
+        return list(self.object_list.order_by('created', 'pk')[:limit])
+
+    def older(self, key, limit):
+        created, pk = key
+        return list(self.object_list.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        ).order_by('created', 'pk')[:limit])
+
+    def newer(self, key, limit):
+        created, pk = key
+        return list(self.object_list.filter(
+            Q(created__lt=created) | Q(created=created, pk__lt=pk)
+        ).order_by('-created', '-pk')[:limit])
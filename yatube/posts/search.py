@@ -0,0 +1,274 @@
+'''Полнотекстовый поиск по постам.
+
+На PostgreSQL поиск идёт по GIN-индексу над to_tsvector(text), который
+база обновляет сама. На SQLite тексты постов копируются в виртуальную
+таблицу FTS5 posts_post_fts, её держат в актуальном виде сигналы
+сохранения и удаления поста. На прочих базах, а также на SQLite без
+FTS5, остаётся поиск подстроки.
+
+Частое слово встречается в доброй половине постов, и считать
+релевантность для всех совпадений на каждой странице слишком дорого.
+Поэтому совпадения делятся по id на окна (bottom, top] не больше чем
+по RANK_WINDOW постов: окна идут от новых к старым, а внутри окна посты
+отсортированы по релевантности. Страница стоит не дороже ранжирования
+одного-двух окон, а долистать можно до любого совпадения. Курсор
+хранит окно и (релевантность, id) поста, как ленты - (pub_date, id).
+'''
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+FTS_TABLE: str = 'posts_post_fts'
+CONFIG: str = 'russian'
+# Больше слов в запросе не нужно, а длинный запрос дорого разбирать.
+MAX_TERMS: int = 8
+RANK_WINDOW: int = 1000
+WORD = re.compile(r'\w+')
+
+_fts5 = {}
+
+
+def terms(query):
+    return WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def fts5_available(using=connection):
+    if using.alias not in _fts5:
+        with using.cursor() as cursor:
+            cursor.execute(
+                "SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            _fts5[using.alias] = bool(cursor.fetchone()[0])
+    return _fts5[using.alias]
+
+
+def backend():
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and fts5_available():
+        return 'sqlite'
+    return 'like'
+
+
+def _match(words):
+    '''Запрос FTS5: все слова, каждое как префикс.'''
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _tsquery(words):
+    from django.contrib.postgres.search import SearchQuery
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        config=CONFIG, search_type='raw',
+    )
+
+
+def _tsvector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('text', config=CONFIG)
+
+
+def filter_posts(queryset, query):
+    '''Посты из queryset, в которых есть все слова запроса.'''
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    kind = backend()
+    if kind == 'postgresql':
+        return queryset.annotate(
+            search=_tsvector()).filter(search=_tsquery(words))
+    if kind == 'sqlite':
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [_match(words)],
+        ))
+    condition = Q()
+    for word in words:
+        condition &= Q(text__icontains=word)
+    return queryset.filter(condition)
+
+
+def _rows_fts5(words, bottom, top, descending, limit):
+    conditions, params = [f'{FTS_TABLE} MATCH %s'], [_match(words)]
+    if bottom is not None:
+        conditions.append('rowid > %s')
+        params.append(bottom)
+    if top is not None:
+        conditions.append('rowid <= %s')
+        params.append(top)
+    sql = (
+        f'SELECT rowid, -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'ORDER BY rowid {"DESC" if descending else "ASC"} LIMIT %s'
+    )
+    # LIMIT -1 в SQLite - без ограничения.
+    params.append(-1 if limit is None else limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _rows_orm(words, bottom, top, descending, limit):
+    queryset = filter_posts(Post.objects.all(), ' '.join(words))
+    if bottom is not None:
+        queryset = queryset.filter(pk__gt=bottom)
+    if top is not None:
+        queryset = queryset.filter(pk__lte=top)
+    if backend() == 'postgresql':
+        from django.contrib.postgres.search import SearchRank
+        score = SearchRank(_tsvector(), _tsquery(words))
+    else:
+        # Без индекса ранжировать нечем: новые посты первыми.
+        score = Value(0.0, output_field=FloatField())
+    rows = queryset.annotate(score=score).order_by(
+        '-pk' if descending else 'pk').values_list('pk', 'score')
+    return list(rows if limit is None else rows[:limit])
+
+
+def _rows(words, bottom=None, top=None, descending=True, limit=None):
+    '''Пары (id, релевантность) совпадений с bottom < id <= top.'''
+    fetch = _rows_fts5 if backend() == 'sqlite' else _rows_orm
+    return fetch(words, bottom, top, descending, limit)
+
+
+def _window_below(words, top):
+    '''Окно из RANK_WINDOW совпадений не новее top: (bottom, строки).'''
+    rows = _rows(words, top=top, limit=RANK_WINDOW)
+    bottom = rows[-1][0] - 1 if len(rows) == RANK_WINDOW else None
+    return bottom, rows
+
+
+def _window_above(words, bottom):
+    '''Окно из RANK_WINDOW совпадений новее bottom: (top, строки).'''
+    rows = _rows(words, bottom=bottom, descending=False, limit=RANK_WINDOW)
+    top = rows[-1][0] if len(rows) == RANK_WINDOW else None
+    return top, rows
+
+
+def _rank_key(row):
+    return row[1], row[0]
+
+
+def ranked(words, key=None, forward=True, limit=10):
+    '''Тройки (id, релевантность, окно) в порядке выдачи от курсора.
+
+    key - (bottom, top, релевантность, id) последнего показанного
+    поста, forward=False листает назад. Окно - границы (bottom, top],
+    None - без границы.
+    '''
+    if not words:
+        return []
+    if key is None:
+        top, (bottom, rows) = None, _window_below(words, None)
+        edge = None
+    else:
+        bottom, top, score, pk = key
+        rows = _rows(words, bottom, top)
+        edge = score, pk
+    result = []
+    while True:
+        rows = sorted(rows, key=_rank_key, reverse=forward)
+        if edge is not None:
+            rows = [
+                row for row in rows
+                if (_rank_key(row) < edge if forward
+                    else _rank_key(row) > edge)
+            ]
+        result.extend((pk, score, (bottom, top)) for pk, score in rows)
+        if len(result) >= limit:
+            return result[:limit]
+        edge = None
+        if forward:
+            if bottom is None:
+                return result
+            top, (bottom, rows) = bottom, _window_below(words, bottom)
+        else:
+            if top is None:
+                return result
+            bottom, (top, rows) = top, _window_above(words, top)
+        if not rows:
+            return result
+
+
+def index_post(post):
+    if backend() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(pk):
+    if backend() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild():
+    '''Заново заполняет индекс; нужен после bulk_create и загрузки дампа.'''
+    if backend() != 'sqlite':
+        return Post.objects.count()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        return cursor.rowcount
+
+
+class SearchPaginator(CursorPaginator):
+    '''Постраничная выдача поиска по курсору (релевантность, id).'''
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.for_feed(), per_page)
+        self.words = terms(query)
+
+    def encode(self, post):
+        bottom, top = (
+            '' if edge is None else edge for edge in post.search_window)
+        return pack_cursor(
+            f'{bottom}:{top}:{post.search_score!r}', post.pk)
+
+    def decode(self, token):
+        unpacked = unpack_cursor(token)
+        if unpacked is None:
+            return None
+        try:
+            bottom, top, score = unpacked[0].split(':')
+            return (
+                int(bottom) if bottom else None,
+                int(top) if top else None,
+                float(score),
+                unpacked[1],
+            )
+        except ValueError:
+            return None
+
+    def _load(self, rows):
+        posts = self.object_list.in_bulk([pk for pk, _, _ in rows])
+        result = []
+        for pk, score, window in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_score = score
+                post.search_window = window
+                result.append(post)
+        return result
+
+    def first(self, limit):
+        return self._load(ranked(self.words, limit=limit))
+
+    def older(self, key, limit):
+        return self._load(ranked(self.words, key, limit=limit))
+
+    def newer(self, key, limit):
+        return self._load(ranked(self.words, key, False, limit))
@@ -0,0 +1,189 @@
+'''Синтетические данные для нагрузочных тестов и бенчмарков.
+
+Объёмы задаются параметрами команды seed_bench. Популярность авторов
+распределена по степенному закону: немногие пишут большую часть постов
+и собирают большую часть подписчиков, как на живом сайте. Данные
+вставляются через bulk_create, поэтому сигналы не срабатывают, и
+производные данные в конце пересобирает maintenance.rebuild_derived.
+Один и тот же seed даёт одни и те же данные.
+'''
+import random
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from faker import Faker
+from PIL import Image
+
+from . import maintenance
+from .models import Comment, Follow, Group, Post
+from .storage import post_image_storage
+
+User = get_user_model()
+
+USERNAME_PREFIX: str = 'bench_'
+BATCH_SIZE: int = 5000
+IMAGE_SIZE: tuple = (1280, 720)
+
+
+class Seeder:
+    def __init__(self, seed=0, alpha=1.2, batch_size=BATCH_SIZE):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.alpha = alpha
+        self.batch_size = batch_size
+
+    def weights(self, count):
+        '''Накопленные веса по закону Ципфа: k-й весит 1 / k^alpha.
+
+        Накопленные, чтобы random.choices не пересчитывал их на каждом
+        вызове: на миллионе постов это разница между секундами и часами.
+        '''
+        return list(accumulate(
+            1 / (rank + 1) ** self.alpha for rank in range(count)))
+
+    def _bulk(self, model, objects):
+        batch = []
+        created = 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+        return created
+
+    def users(self, count):
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX).count()
+        self._bulk(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password='!',
+            )
+            for number in range(start, start + count)
+        ))
+        return list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def groups(self, count):
+        start = Group.objects.filter(
+            slug__startswith=USERNAME_PREFIX).count()
+        self._bulk(Group, (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{USERNAME_PREFIX}{number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(start, start + count)
+        ))
+        return list(
+            Group.objects.filter(slug__startswith=USERNAME_PREFIX)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def image_names(self, count):
+        '''Несколько разных картинок: большинство постов их повторяет.'''
+        names = []
+        for number in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            names.append(post_image_storage.save(
+                f'posts/bench{number}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def posts(self, count, authors, groups, image_names, image_share):
+        weights = self.weights(len(authors))
+        rnd = self.random
+
+        def make():
+            image = ''
+            if image_names and rnd.random() < image_share:
+                image = rnd.choice(image_names)
+            return Post(
+                text=self.fake.paragraph(nb_sentences=rnd.randint(1, 6)),
+                author_id=rnd.choices(authors, cum_weights=weights)[0],
+                group_id=(
+                    rnd.choice(groups)
+                    if groups and rnd.random() < 0.7 else None
+                ),
+                image=image,
+            )
+
+        return self._bulk(Post, (make() for _ in range(count)))
+
+    def comments(self, count, authors):
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        if not post_ids:
+            return 0
+        rnd = self.random
+        rnd.shuffle(post_ids)
+        post_weights = self.weights(len(post_ids))
+        author_weights = self.weights(len(authors))
+        return self._bulk(Comment, (
+            Comment(
+                post_id=rnd.choices(post_ids, cum_weights=post_weights)[0],
+                author_id=rnd.choices(
+                    authors, cum_weights=author_weights)[0],
+                text=self.fake.sentence(),
+            )
+            for _ in range(count)
+        ))
+
+    def follows(self, users, mean):
+        '''Граф подписок: число подписок и подписчиков с тяжёлым хвостом.'''
+        if len(users) < 2 or not mean:
+            return 0
+        weights = self.weights(len(users))
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        rnd = self.random
+
+        def make():
+            for user_id in users:
+                # У Парето с alpha=1.5 среднее 3, отсюда деление.
+                wanted = min(
+                    int(rnd.paretovariate(1.5) * mean / 3),
+                    len(users) - 1,
+                )
+                authors = set(
+                    rnd.choices(users, cum_weights=weights, k=wanted * 2))
+                authors.discard(user_id)
+                for author_id in list(authors)[:wanted]:
+                    if (user_id, author_id) not in existing:
+                        yield Follow(user_id=user_id, author_id=author_id)
+
+        return self._bulk(Follow, make())
+
+
+@transaction.atomic
+def seed(users=100, groups=10, posts=1000, comments=2000, follows=20,
+         image_share=0.1, distinct_images=10, alpha=1.2, seed=0,
+         batch_size=BATCH_SIZE):
+    '''Создаёт данные и возвращает, сколько чего получилось.'''
+    seeder = Seeder(seed=seed, alpha=alpha, batch_size=batch_size)
+    user_ids = seeder.users(users)
+    seeder.random.shuffle(user_ids)
+    group_ids = seeder.groups(groups)
+    image_names = seeder.image_names(distinct_images) if image_share else []
+    result = {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': seeder.posts(
+            posts, user_ids, group_ids, image_names, image_share),
+        'comments': seeder.comments(comments, user_ids),
+        'follows': seeder.follows(user_ids, follows),
+    }
+    maintenance.rebuild_derived()
+    return result
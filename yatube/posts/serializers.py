@@ -0,0 +1,73 @@
+'''Лёгкие сериализаторы постов для JSON API.
+
+Каждое поле - функция от уже загруженного объекта: автор и группа
+приходят в том же запросе (Post.objects.for_feed()), поэтому
+сериализация не обращается к базе. Параметр ?fields=id,text оставляет
+в ответе только перечисленные поля.
+'''
+from .stats import STATS_FIELDS
+
+POST_FIELDS: dict = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+COMMENT_FIELDS: dict = {
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+}
+
+
+class UnknownFields(ValueError):
+    pass
+
+
+def parse_fields(value, known=POST_FIELDS):
+    '''Имена полей из ?fields=; без параметра - все поля.'''
+    if not value:
+        return tuple(known)
+    fields = tuple(name.strip() for name in value.split(',') if name.strip())
+    unknown = [name for name in fields if name not in known]
+    if unknown:
+        raise UnknownFields(', '.join(unknown))
+    return fields
+
+
+def serialize(obj, fields, getters=POST_FIELDS):
+    return {name: getters[name](obj) for name in fields}
+
+
+def serialize_comment(comment):
+    return serialize(comment, COMMENT_FIELDS, COMMENT_FIELDS)
+
+
+def serialize_page(page, fields, getters=POST_FIELDS):
+    return {
+        'results': [serialize(obj, fields, getters) for obj in page],
+        'next': page.next_cursor if page.has_next() else None,
+        'previous': (
+            page.previous_cursor if page.has_previous() else None),
+    }
+
+
+def serialize_group(group):
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }
+
+
+def serialize_author(author):
+    # Строки счётчиков может ещё не быть, как и в шаблоне профиля.
+    stats = getattr(author, 'stats', None)
+    return {
+        'username': author.username,
+        **{name: getattr(stats, name, 0) for name in STATS_FIELDS},
+    }
@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import caching, images, search, stats, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    '''Новый пост попадает в ленты подписчиков автора.'''
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_purge(sender, instance, **kwargs):
+    timeline.purge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, **kwargs):
+    '''Закешированные страницы лент устарели.
+
+    Поколение сдвигается после коммита: иначе запрос, пришедший до него,
+    собрал бы страницу из старых данных и сохранил под новым поколением.
+    '''
+    transaction.on_commit(
+        lambda: caching.bump_generation(caching.POSTS_SCOPE))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+
+    def bump():
+        caching.bump_generation(caching.follow_scope(user_id))
+        caching.bump_generation(caching.author_scope(author_id))
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_cards_drop(sender, instance, created=False, **kwargs):
+    '''Правка поста в post_edit или админке: карточка устарела.'''
+    if not created:
+        post_id = instance.pk
+        transaction.on_commit(lambda: caching.drop_cards([post_id]))
+
+
+@receiver(post_save, sender=Group)
+def group_cards_drop(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        transaction.on_commit(lambda: caching.drop_cards(
+            instance.posts.values_list('pk', flat=True).iterator()))
+
+
+@receiver(post_save, sender=User)
+def author_cards_drop(sender, instance, created, raw=False,
+                      update_fields=None, **kwargs):
+    # Вход сохраняет только last_login: карточки автора не меняются.
+    if created or raw or (
+            update_fields is not None and 'username' not in update_fields):
+        return
+    transaction.on_commit(lambda: caching.drop_cards(
+        instance.posts.values_list('pk', flat=True).iterator()))
+
+
+@receiver(post_save, sender=User)
+def user_stats_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def authored_created(sender, instance, created, **kwargs):
+    if created:
+        field = 'posts_count' if sender is Post else 'comments_count'
+        stats.change(instance.author_id, field, 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def authored_deleted(sender, instance, **kwargs):
+    field = 'posts_count' if sender is Post else 'comments_count'
+    stats.change(instance.author_id, field, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_created(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        stats.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_count_deleted(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        stats.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_stats_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.user_id, 'following_count', 1)
+        stats.change(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_stats_deleted(sender, instance, **kwargs):
+    stats.change(instance.user_id, 'following_count', -1)
+    stats.change(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_fan_out_stop(sender, instance, created, **kwargs):
+    # После follow_stats_created: followers_count уже увеличен.
+    if created:
+        timeline.follower_gained(instance.author_id)
+
+
+@receiver(post_init, sender=Post)
+def post_image_remember(sender, instance, **kwargs):
+    # Через __dict__, чтобы не загружать отложенное поле у .only().
+    image = instance.__dict__.get('image')
+    instance._stored_image = getattr(image, 'name', image) or ''
+
+
+@receiver(post_save, sender=Post)
+def post_image_refs(sender, instance, created, raw=False, **kwargs):
+    if raw or 'image' not in instance.__dict__:
+        return
+    name = instance.image.name or ''
+    previous = '' if created else instance._stored_image
+    if name != previous:
+        images.acquire(name)
+        images.release(previous)
+    instance._stored_image = name
+
+
+@receiver(post_delete, sender=Post)
+def post_image_release(sender, instance, **kwargs):
+    images.release(instance._stored_image)
+
+
+@receiver(post_save, sender=Post)
+def post_search_index(sender, instance, **kwargs):
+    if 'text' in instance.__dict__:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_search_unindex(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
@@ -0,0 +1,121 @@
+'''Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются атомарным UPDATE ... SET n = n + 1 в той же
+транзакции, что и сам объект. Если строки со счётчиками ещё нет, она
+создаётся пересчётом, а расхождения выравнивает команда
+reconcile_stats. Так же устроен счётчик комментариев поста
+Post.comments_count.
+'''
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE: int = 500
+STATS_FIELDS: tuple = (
+    'posts_count', 'followers_count', 'following_count', 'comments_count',
+)
+
+
+def change(user_id, field, delta):
+    '''Сдвигает счётчик пользователя, не опуская его ниже нуля.'''
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if stats.update(**{field: F(field) + delta}) or delta < 0:
+        return
+    recount(user_id)
+
+
+def _counts(user_ids, fields=STATS_FIELDS):
+    '''Настоящие значения счётчиков fields для пачки пользователей.'''
+    counts = {user_id: dict.fromkeys(fields, 0) for user_id in user_ids}
+    queries = (
+        ('posts_count', Post.objects, 'author_id'),
+        ('comments_count', Comment.objects, 'author_id'),
+        ('followers_count', Follow.objects, 'author_id'),
+        ('following_count', Follow.objects, 'user_id'),
+    )
+    for field, manager, column in queries:
+        if field not in fields:
+            continue
+        rows = (
+            manager.filter(**{f'{column}__in': user_ids})
+            .order_by()
+            .values(column)
+            .annotate(total=Count('pk'))
+            .values_list(column, 'total')
+        )
+        for user_id, total in rows:
+            counts[user_id][field] = total
+    return counts
+
+
+def recount(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=_counts([user_id])[user_id])
+    return stats
+
+
+def reconcile(batch_size=BATCH_SIZE, fields=STATS_FIELDS):
+    '''Выравнивает счётчики, возвращает число исправленных записей.
+
+    fields - какие счётчики пересчитывать: после импорта одной таблицы
+    остальные не менялись. Недостающие строки считаются целиком.
+    '''
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            User.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return fixed
+        last_id = batch[-1]
+        counts = _counts(batch, fields)
+        existing = UserStats.objects.in_bulk(batch)
+        absent = [user_id for user_id in batch if user_id not in existing]
+        missing = [
+            UserStats(user_id=user_id, **values)
+            for user_id, values in _counts(absent).items()
+        ]
+        drifted = []
+        for user_id, values in counts.items():
+            stats = existing.get(user_id)
+            if stats is None:
+                continue
+            if any(getattr(stats, name) != value
+                   for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(stats, name, value)
+                drifted.append(stats)
+        UserStats.objects.bulk_create(missing, batch_size=batch_size)
+        UserStats.objects.bulk_update(
+            drifted, fields, batch_size=batch_size)
+        fixed += len(missing) + len(drifted)
+
+
+def change_comments(post_id, delta):
+    '''Сдвигает счётчик комментариев поста, не опуская его ниже нуля.'''
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def reconcile_comments():
+    '''Выравнивает счётчики комментариев постов одним UPDATE.'''
+    actual = Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(total=Count('pk')).values('total')
+    ), 0)
+    return (
+        Post.objects.annotate(actual=actual)
+        .exclude(comments_count=F('actual'))
+        .update(comments_count=actual)
+    )
@@ -0,0 +1,69 @@
+'''Хранилище картинок постов с адресацией по содержимому.
+
+Имя файла - sha256 его содержимого, разложенный по подкаталогам:
+posts/ab/cd/abcd...ef.jpg. Повторная загрузка той же картинки не
+создаёт новый файл, а миниатюры и адаптивные копии, привязанные к имени,
+переиспользуются. Ссылки постов на файлы считает модуль images.
+'''
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE: int = 64 * 1024
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, sha256):
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(
+        directory, sha256[:2], sha256[2:4], f'{sha256}{extension}')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Файловое хранилище, которое не пишет одно содержимое дважды.'''
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        try:
+            return self._save(name, content)
+        except FileExistsError:
+            # Тот же файл успел записать параллельный запрос.
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # _save зовёт его, когда файл появился между exists() и записью.
+        # Другое имя для того же содержимого не нужно: пусть save
+        # вернёт уже записанный файл.
+        if is_hashed(name):
+            raise FileExistsError(name)
+        return super().get_available_name(name, max_length)
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,94 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from core import routers, stampede
+
+from ..caching import (card_key, card_variant, card_version, feed_page_key,
+                       feed_timeout, feed_version)
+from .post_images import post_derivatives, prefetch_images
+
+register = template.Library()
+
+CARD_TEMPLATE: str = 'includes/post_list.html'
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, feed, vary_on):
+        self.nodelist = nodelist
+        self.feed = feed
+        self.vary_on = vary_on
+
+    def render(self, context):
+        feed = self.feed.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cached = stampede.refresh if routers.pinned() else stampede.get_or_set
+        return cached(
+            feed_page_key(feed, vary_on, context.get('request')),
+            lambda: self.nodelist.render(context),
+            feed_timeout(feed),
+            version=feed_version(feed, vary_on),
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    '''Кеширует фрагмент страницы ленты до изменения данных.
+
+    {% feed_cache 'group_list' group.pk %} ... {% endfeed_cache %}
+    '''
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 1 argument.")
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+def render_card(context, template, post, group_link, profile_link):
+    with context.push(post=post, SHOW_GROUP_LINK=group_link,
+                      SHOW_PROFILE_LINK=profile_link):
+        return template.render(context)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, group_link=False, profile_link=False):
+    '''HTML карточек постов страницы: из кеша одним get_many,
+    недостающие рисуются и кладутся одним set_many.
+
+    {% post_cards page_obj group_link=True as cards %}
+    {% for card in cards %}{{ card }}{% endfor %}
+    '''
+    posts = list(posts)
+    variant = card_variant(group_link, profile_link)
+    keys = [card_key(post.pk, variant) for post in posts]
+    cached = cache.get_many(keys)
+    versions = [card_version(post) for post in posts]
+    stale = [
+        post for post, key, version in zip(posts, keys, versions)
+        if cached.get(key, (None,))[0] != version
+    ]
+    prefetch_images(stale)
+    template = context.template.engine.get_template(CARD_TEMPLATE)
+    cards = []
+    fresh = {}
+    for post, key, version in zip(posts, keys, versions):
+        entry = cached.get(key)
+        if entry is not None and entry[0] == version:
+            cards.append(mark_safe(entry[1]))
+            continue
+        card = render_card(context, template, post, group_link, profile_link)
+        cards.append(mark_safe(card))
+        # Пока копий картинки нет, карточка показывает запасной вариант:
+        # такую не кешируем, иначе она переживёт готовность копий.
+        if not post.image or post_derivatives(post.image):
+            fresh[key] = (version, card)
+    if fresh:
+        cache.set_many(fresh, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,72 @@
+import logging
+
+from django import template
+
+from core.timing import timer
+
+from ..derivatives import ready_derivatives, ready_many
+from ..thumbnails import ready_thumbnail, ready_thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+def prefetch_images(posts, preset='card'):
+    '''Готовые копии и миниатюры картинок страницы одним проходом.
+
+    Ответ запоминается на поле картинки поста, и post_derivatives и
+    post_thumbnail в карточках уже не обращаются ни к кешу, ни к базе.
+    '''
+    images = [post.image for post in posts if post.image]
+    if not images:
+        return
+    try:
+        with timer('thumb'):
+            pictures = ready_many([image.name for image in images])
+            waiting = [
+                image for image in images if not pictures[image.name]]
+            thumbnails = ready_thumbnails(waiting, preset)
+    except Exception:
+        logger.exception('Не удалось найти копии картинок страницы')
+        return
+    for image in images:
+        image.ready_derivatives = pictures[image.name]
+        image.ready_thumbnails = {preset: thumbnails.get(image.name)}
+
+
+@register.simple_tag
+def post_thumbnail(image, preset='card'):
+    '''Готовая миниатюра картинки или None, пока её не сделал обработчик.
+
+    {% post_thumbnail post.image as im %}
+    '''
+    if not image:
+        return None
+    prefetched = getattr(image, 'ready_thumbnails', {})
+    if preset in prefetched:
+        return prefetched[preset]
+    try:
+        with timer('thumb'):
+            return ready_thumbnail(image, preset)
+    except Exception:
+        logger.exception('Не удалось найти миниатюру для %s', image)
+        return None
+
+
+@register.simple_tag
+def post_derivatives(image):
+    '''Адаптивные копии картинки для srcset или None, пока их нет.
+
+    {% post_derivatives post.image as picture %}
+    '''
+    if not image:
+        return None
+    if hasattr(image, 'ready_derivatives'):
+        return image.ready_derivatives
+    try:
+        with timer('thumb'):
+            return ready_derivatives(image)
+    except Exception:
+        logger.exception('Не удалось найти копии для %s', image)
+        return None
@@ -0,0 +1,109 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+
+from ..models import Comment, Follow, Group, Post
+from ..serializers import POST_FIELDS
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    NUM_POSTS: int = 13
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for number in range(cls.NUM_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+        cls.post = Post.objects.latest('pk')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_index(self):
+        """Лента: все поля поста, курсор на следующую страницу"""
+        data = self.guest.get(reverse('api:index')).json()
+        self.assertEqual(len(data['results']), 10)
+        first = data['results'][0]
+        self.assertEqual(set(first), set(POST_FIELDS))
+        self.assertEqual(first['id'], self.post.pk)
+        self.assertEqual(first['author'], 'author')
+        self.assertEqual(first['group'], 'group')
+        self.assertIsNone(data['previous'])
+        data = self.guest.get(
+            reverse('api:index'), {'after': data['next']}).json()
+        self.assertEqual(len(data['results']), self.NUM_POSTS - 10)
+        self.assertIsNone(data['next'])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только нужные поля"""
+        data = self.guest.get(
+            reverse('api:index'), {'fields': 'id,text'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        response = self.guest.get(reverse('api:index'), {'fields': 'email'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_no_queries_per_post(self):
+        """Страница - один запрос, из кеша - ни одного"""
+        with self.assertNumQueries(1):
+            self.guest.get(reverse('api:index'))
+        with self.assertNumQueries(0):
+            self.guest.get(reverse('api:index'))
+
+    def test_shared_invalidation(self):
+        """Новый пост сбрасывает кеш API, как и HTML-ленты"""
+        self.guest.get(reverse('api:index'))
+        with on_commit_callbacks():
+            post = Post.objects.create(text='Свежий', author=self.author)
+        data = self.guest.get(reverse('api:index')).json()
+        self.assertEqual(data['results'][0]['id'], post.pk)
+
+    def test_pages(self):
+        """Группа, профиль, пост и лента подписок"""
+        data = self.guest.get(reverse(
+            'api:group_list', kwargs={'slug': 'group'})).json()
+        self.assertEqual(data['group']['slug'], 'group')
+        data = self.guest.get(reverse(
+            'api:profile', kwargs={'username': 'author'})).json()
+        self.assertEqual(data['author']['posts_count'], self.NUM_POSTS)
+        self.assertEqual(data['author']['followers_count'], 1)
+        data = self.guest.get(reverse(
+            'api:post_detail', kwargs={'post_id': self.post.pk})).json()
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        data = self.client.get(reverse('api:follow_index')).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_errors(self):
+        """Ошибки API отдаются в JSON"""
+        response = self.guest.get(reverse(
+            'api:group_list', kwargs={'slug': 'nope'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
+        response = self.guest.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertFalse(response.has_header('ETag'))
+
+    @override_settings(CACHE_SHARED=True)
+    def test_not_modified(self):
+        """API отвечает 304 по ETag, как и HTML-страницы"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest.get(url)
+        again = self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+
+from .. import caching
+from ..models import Follow, Group, Post
+from ..templatetags import feed_cache
+
+User = get_user_model()
+
+CARDS = Template(
+    '{% load feed_cache %}'
+    '{% post_cards posts group_link=True profile_link=True as cards %}'
+    '{% for card in cards %}{{ card }}<hr>{% endfor %}')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(10)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return list(Post.objects.for_feed().order_by('pk'))
+
+    def render(self):
+        return CARDS.render(Context({'posts': self.posts()}))
+
+    def card_keys(self):
+        return [caching.card_key(post.pk, 'gp') for post in self.posts()]
+
+    def test_page_is_one_get_many(self):
+        """Страница из кеша - один get_many и ни одной отрисовки"""
+        first = self.render()
+        backend = mock.Mock(wraps=caches['default'])
+        with mock.patch.object(feed_cache, 'cache', backend), \
+                mock.patch.object(feed_cache, 'render_card') as render_card:
+            second = self.render()
+        self.assertEqual(first, second)
+        self.assertEqual(backend.get_many.call_count, 1)
+        backend.get.assert_not_called()
+        backend.set_many.assert_not_called()
+        render_card.assert_not_called()
+        self.assertEqual(second.count('<article>'), 10)
+
+    def test_cards_shared_between_feeds(self):
+        """Лента подписок берёт карточки, нарисованные для главной"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        client = Client()
+        client.force_login(reader)
+        client.get(reverse('posts:index'))
+        with mock.patch.object(feed_cache, 'render_card') as render_card:
+            response = client.get(reverse('posts:follow_index'))
+        render_card.assert_not_called()
+        self.assertContains(response, 'Пост 9')
+
+    def test_edit_drops_card(self):
+        """Правка поста удаляет его карточку, остальные остаются"""
+        self.render()
+        post = Post.objects.order_by('pk').first()
+        post.text = 'Исправленный пост'
+        with on_commit_callbacks():
+            post.save()
+        keys = self.card_keys()
+        self.assertNotIn(keys[0], cache.get_many(keys))
+        self.assertEqual(len(cache.get_many(keys)), 9)
+        self.assertIn('Исправленный пост', self.render())
+
+    def test_group_rename_drops_cards(self):
+        """Переименование группы удаляет карточки её постов"""
+        self.render()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        with on_commit_callbacks():
+            group.save()
+        self.assertEqual(cache.get_many(self.card_keys()), {})
+        self.assertIn(reverse('posts:group_list', args=['renamed']),
+                      self.render())
+
+    def test_author_rename_drops_cards(self):
+        """Смена имени автора удаляет его карточки, вход - нет"""
+        self.render()
+        author = User.objects.get(pk=self.author.pk)
+        Client().force_login(author)
+        self.assertEqual(len(cache.get_many(self.card_keys())), 10)
+        author.username = 'renamed'
+        with on_commit_callbacks():
+            author.save()
+        self.assertEqual(cache.get_many(self.card_keys()), {})
+        self.assertIn('Автор: renamed', self.render())
+
+    def test_change_without_signal_rerenders(self):
+        """Карточка другой версии не отдаётся, даже если её не удалили"""
+        self.render()
+        Post.objects.filter(pk=self.posts()[0].pk).update(text='Через update')
+        self.assertIn('Через update', self.render())
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import stats
+from ..models import Comment, Post
+from ..views import NUM_COMMENTS_NEED
+
+User = get_user_model()
+TOTAL = NUM_COMMENTS_NEED * 2 + 5
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        now = timezone.now()
+        # Две пары комментариев с одинаковым временем: порядок по id.
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}',
+                    created=now + timedelta(seconds=i // 2))
+            for i in range(TOTAL)
+        ])
+        stats.reconcile_comments()
+        cls.ordered = list(
+            Comment.objects.filter(post=cls.post)
+            .order_by('created', 'pk').values_list('text', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_page_embedded(self):
+        """На странице поста только первая страница комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            self.ordered[:NUM_COMMENTS_NEED])
+        self.assertContains(response, f'Комментариев: {TOTAL}')
+        self.assertContains(response, 'data-fragment=')
+        self.assertNotContains(response, self.ordered[-1])
+
+    def test_fragments_cover_all_comments(self):
+        """Фрагменты по курсору отдают все комментарии по одному разу"""
+        page = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        texts = [comment.text for comment in page]
+        while page.has_next():
+            response = self.client.get(
+                reverse('posts:post_comments', args=[self.post.pk]),
+                {'after': page.next_cursor})
+            self.assertTemplateUsed(response, 'includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            page = response.context['comments']
+            texts.extend(comment.text for comment in page)
+        self.assertEqual(texts, self.ordered)
+
+    def test_count_without_count_query(self):
+        """Число комментариев берётся из поля, а не из COUNT(*)"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertFalse(any(
+            'COUNT(' in query['sql'].upper() for query in queries))
+
+    def test_fragment_missing_post(self):
+        """Фрагмент комментариев несуществующего поста - 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_pages(self):
+        """API отдаёт первую страницу с постом и следующие по курсору"""
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk])).json()
+        self.assertEqual(data['comments_count'], TOTAL)
+        self.assertEqual(len(data['comments']), NUM_COMMENTS_NEED)
+        data = self.client.get(
+            reverse('api:post_comments', args=[self.post.pk]),
+            {'after': data['comments_next']}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            self.ordered[NUM_COMMENTS_NEED:NUM_COMMENTS_NEED * 2])
+
+
+class CommentsCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def count(self):
+        return Post.objects.get(pk=self.post.pk).comments_count
+
+    def test_signals_keep_count(self):
+        """Создание и удаление комментария сдвигают счётчик поста"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Ещё один')
+        self.assertEqual(self.count(), 2)
+        comment.delete()
+        self.assertEqual(self.count(), 1)
+
+    def test_reconcile(self):
+        """reconcile_comments исправляет разошедшиеся счётчики"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text=f'{i}')
+            for i in range(3)
+        ])
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(stats.reconcile_comments(), 1)
+        self.assertEqual(self.count(), 3)
+        self.assertEqual(stats.reconcile_comments(), 0)
@@ -0,0 +1,137 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CACHE_SHARED=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+        }
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def edit_post(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Правка'
+        post.save()
+
+    def test_not_modified(self):
+        """Без изменений страница отвечает 304 не больше чем за запрос"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(
+                        1 if name in ('profile', 'post_detail') else 0):
+                    again = self.revalidate(self.guest, url, response)
+                self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(again.content, b'')
+                # Первый ответ ставит CSRF-cookie, она входит в ETag.
+                self.client.get(url)
+                response = self.client.get(url)
+                again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """Клиент без ETag получает 304 по дате"""
+        url = self.urls['post_detail']
+        response = self.guest.get(url)
+        again = self.guest.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_reset_validators(self):
+        """Комментарий, правка и подписка меняют валидаторы"""
+        changes = {
+            'post_detail': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Новый'),
+            'index': self.edit_post,
+            'profile': lambda: Follow.objects.create(
+                user=User.objects.create_user(username='fan'),
+                author=self.author),
+        }
+        for name, change in changes.items():
+            with self.subTest(page=name):
+                url = self.urls[name]
+                response = self.guest.get(url)
+                with on_commit_callbacks():
+                    change()
+                again = self.revalidate(self.guest, url, response)
+                self.assertEqual(again.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        """Гость и пользователь не делят ETag"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest.get(url)
+                again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, HTTPStatus.OK)
+
+    def test_login_resets_validators(self):
+        """После нового входа страница с формой не отвечает 304"""
+        url = self.urls['post_detail']
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.client.logout()
+        self.client.force_login(self.reader)
+        self.client.get(url)
+        self.assertIn(settings.CSRF_COOKIE_NAME, self.client.cookies)
+        again = self.revalidate(self.client, url, response)
+        self.assertEqual(again.status_code, HTTPStatus.OK)
+
+    def test_error_without_validators(self):
+        """Ответ 404 уходит без ETag и Last-Modified"""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('api:group_list', kwargs={'slug': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_no_validators_without_shared_cache(self):
+        """Без общего кеша страницы не отвечают 304"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest.get(url)
+                self.assertFalse(response.has_header('ETag'))
+                again = self.guest.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(again.status_code, HTTPStatus.OK)
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост «{number}», с запятой', author=cls.author,
+                group=cls.group)
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.staff, text='Комментарий')
+        Follow.objects.create(user=cls.staff, author=cls.author)
+
+    def export(self, *args):
+        output = io.StringIO()
+        call_command('export_content', *args, stdout=output)
+        return output.getvalue()
+
+    def test_ndjson(self):
+        """Каждая строка NDJSON - запись по возрастанию id"""
+        records = [
+            json.loads(line) for line in self.export('posts').splitlines()]
+        self.assertEqual(
+            [record['id'] for record in records],
+            sorted(post.pk for post in self.posts))
+        self.assertEqual(records[0]['text'], self.posts[0].text)
+        self.assertEqual(records[0]['author_id'], self.author.pk)
+
+    def test_csv_and_resume(self):
+        """CSV с заголовком и продолжение выгрузки с нужного id"""
+        start = self.posts[3].pk
+        reader = csv.DictReader(io.StringIO(
+            self.export('posts', '--format', 'csv', '--start', str(start))))
+        records = list(reader)
+        self.assertEqual(
+            [int(record['id']) for record in records],
+            [post.pk for post in self.posts[3:]])
+        self.assertEqual(records[0]['text'], self.posts[3].text)
+
+    def test_every_table(self):
+        """Выгружаются посты, комментарии, группы и подписки"""
+        for table, count in (('posts', 5), ('comments', 1),
+                             ('groups', 1), ('follows', 1)):
+            with self.subTest(table=table):
+                self.assertEqual(
+                    len(self.export(table).splitlines()), count)
+
+    def test_view(self):
+        """Выгрузка по адресу доступна только сотрудникам и идёт потоком"""
+        url = reverse('posts:export', kwargs={'table': 'comments'})
+        response = Client().get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Комментарий', content)
+        response = client.get(
+            reverse('posts:export', kwargs={'table': 'users'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -9,6 +10,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Comment, Group, Post
+from ..storage import hashed_name
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -49,6 +51,8 @@ class PostCreateForm(TestCase):
             b'\x00\x00\x01\x00\x01\x00\x00\x02'
             b'\x02\x4c\x01\x00\x3b'
         )
+        self.uploaded_name = hashed_name(
+            'posts/small.gif', hashlib.sha256(small_gif).hexdigest())
         self.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -79,7 +83,7 @@ class PostCreateForm(TestCase):
                 text='Тестовый текст',
                 group=self.group.id,
                 author=self.user,
-                image='posts/small.gif'
+                image=self.uploaded_name
             ).exists()
         )
 
@@ -293,7 +297,8 @@ class PostCreateForm(TestCase):
                 group=self.group.id,
                 author=self.user,
                 pub_date=self.post.pub_date,
-                image='posts/cool.gif'
+                image=hashed_name(
+                    'posts/cool.gif', hashlib.sha256(cool_gif).hexdigest())
             ).exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(Post.objects.count(), posts_count)
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import images, importing, search, timeline
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserStats)
+
+User = get_user_model()
+
+
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cats', description='Описание')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(content)
+        return path
+
+    def ndjson(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records))
+
+    def run_import(self, *args):
+        stderr = StringIO()
+        call_command('bulk_import', *args, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_posts(self):
+        """Посты импортируются с датой из файла, группой и счётчиками"""
+        path = self.ndjson('posts.ndjson', [
+            {'id': 100, 'text': 'Старый пост', 'author': 'alice',
+             'group': 'cats', 'pub_date': '2015-03-01T10:00:00+00:00'},
+            {'id': 101, 'text': 'Ещё пост', 'author': 'bob'},
+            {'id': 102, 'text': 'Чужой', 'author': 'nobody'},
+            {'id': 103, 'text': '', 'author': 'alice'},
+        ])
+        errors = self.run_import('posts', path)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(
+            post.pub_date, datetime(2015, 3, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertIn('Строка 3', errors)
+        self.assertIn('Строка 4', errors)
+        self.assertEqual(
+            UserStats.objects.get(user=self.alice).posts_count, 1)
+        self.assertEqual(
+            Post._meta.get_field('pub_date').auto_now_add, True)
+
+    def test_resume(self):
+        """Повторный запуск и продолжение со строки не дублируют данные"""
+        path = self.ndjson('posts.ndjson', [
+            {'id': number, 'text': f'Пост {number}', 'author': 'alice'}
+            for number in range(1, 6)
+        ])
+        self.run_import('posts', path, '--chunk-size', '2')
+        self.run_import('posts', path)
+        self.assertEqual(Post.objects.count(), 5)
+        Post.objects.filter(pk__gt=3).delete()
+        self.run_import('posts', path, '--start-line', '3')
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)),
+            [1, 2, 3, 4, 5])
+
+    def test_comments_and_follows_csv(self):
+        """Комментарии и подписки из CSV; неизвестный пост - ошибка"""
+        post = Post.objects.create(text='Пост', author=self.alice)
+        comments = self.write('comments.csv', (
+            'post_id,author,text,created\n'
+            f'{post.pk},bob,"Первый, с запятой",2016-01-01T00:00:00\n'
+            f'{post.pk + 1000},bob,Мимо,\n'
+        ))
+        errors = self.run_import('comments', comments)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.text, 'Первый, с запятой')
+        self.assertEqual(comment.created.year, 2016)
+        self.assertIn('нет поста', errors)
+        follows = self.write(
+            'follows.csv', 'user,author\nbob,alice\nbob,alice\nbob,bob\n')
+        self.run_import('follows', follows)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.alice).followers_count, 1)
+
+    def test_accepted_counts_inserted_rows(self):
+        """Принятыми считаются только вставленные строки"""
+        path = self.ndjson('posts.ndjson', [
+            {'id': number, 'text': f'Пост {number}', 'author': 'alice'}
+            for number in (1, 2, 2, 3)
+        ])
+        Post.objects.create(id=3, text='Уже есть', author=self.bob)
+        first = importing.Importer('posts').run(importing.read(path))
+        self.assertEqual((first['accepted'], first['skipped']), (2, 2))
+        again = importing.Importer('posts').run(importing.read(path))
+        self.assertEqual((again['accepted'], again['skipped']), (0, 4))
+        follows = self.write(
+            'follows.csv', 'user,author\nbob,alice\nbob,alice\n')
+        summary = importing.Importer('follows').run(importing.read(follows))
+        self.assertEqual((summary['accepted'], summary['skipped']), (1, 1))
+
+    def test_rebuilds_only_affected_data(self):
+        """Импорт комментариев не пересобирает ленты, поиск и картинки"""
+        post = Post.objects.create(text='Пост', author=self.alice)
+        path = self.write(
+            'comments.csv', f'post_id,author,text\n{post.pk},bob,Первый\n')
+        with mock.patch.object(timeline, 'fill') as fill, \
+                mock.patch.object(search, 'rebuild') as rebuild, \
+                mock.patch.object(images, 'recount') as recount:
+            self.run_import('comments', path)
+        fill.assert_not_called()
+        rebuild.assert_not_called()
+        recount.assert_not_called()
+        self.assertEqual(
+            UserStats.objects.get(user=self.bob).comments_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+    def test_posts_reach_existing_followers(self):
+        """Импортированные посты дописываются в ленты подписчиков"""
+        Follow.objects.create(user=self.bob, author=self.alice)
+        Post.objects.create(text='Свой', author=self.alice)
+        kept = TimelineEntry.objects.get(user=self.bob)
+        path = self.ndjson('posts.ndjson', [
+            {'id': 500, 'text': 'Импорт', 'author': 'alice'}])
+        self.run_import('posts', path)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.bob, post_id=500).exists())
+        self.assertTrue(TimelineEntry.objects.filter(pk=kept.pk).exists())
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class HotLookupIndexTests(TestCase):
+    '''Частые выборки подписок и комментариев идут по индексам.
+
+    На пустых таблицах PostgreSQL всё равно выберет seq scan, поэтому
+    для проверки плана он отключается.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}')
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = self.plan(queryset)
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, r'SCAN (TABLE )?posts_')
+            self.assertNotIn('TEMP B-TREE', plan)
+        else:
+            self.assertIn('Index', plan)
+            self.assertNotIn('Sort', plan)
+        if index:
+            self.assertIn(index, plan)
+
+    def test_follow_pair(self):
+        """Проверка подписки на профиле ищет пару по индексу"""
+        self.assertUsesIndex(
+            Follow.objects.filter(user=self.user, author=self.author))
+
+    def test_followers(self):
+        """Список подписчиков автора идёт по индексу (author, user)"""
+        self.assertUsesIndex(
+            Follow.objects.filter(author=self.author).values('user_id'),
+            'follow_author_user_idx')
+
+    def test_comments_in_creation_order(self):
+        """Комментарии поста идут по индексу и в порядке создания"""
+        comments = self.post.comments.all()
+        self.assertUsesIndex(comments, 'comment_post_created_idx')
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {number}' for number in range(3)])
+
+    def test_follow_pair_unique(self):
+        """Повторная подписка на того же автора не создаётся"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..paginators import (ELLIPSIS, CursorPaginator, decode_cursor,
+                          elided_page_range, encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    NUM_POSTS: int = 25
+    PER_PAGE: int = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        for i in range(cls.NUM_POSTS):
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def paginator(self):
+        return CursorPaginator(Post.objects.all(), self.PER_PAGE)
+
+    def test_cursor_round_trip(self):
+        """Курсор кодирует (pub_date, id) и переживает декодирование"""
+        post = self.ordered[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)), (post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('испорчено'))
+
+    def test_walk_forward_and_back(self):
+        """Проход вперёд и назад возвращает те же страницы"""
+        first = self.paginator().get_cursor_page()
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.paginator().get_cursor_page(after=first.next_cursor)
+        third = self.paginator().get_cursor_page(after=second.next_cursor)
+        self.assertEqual(
+            list(first) + list(second) + list(third), self.ordered)
+        self.assertFalse(third.has_next())
+        back = self.paginator().get_cursor_page(
+            before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_no_count_query(self):
+        """Курсорная страница не считает всю таблицу"""
+        with CaptureQueriesContext(connection) as queries:
+            page = self.paginator().get_cursor_page()
+            page.has_other_pages()
+        self.assertEqual(len(queries), 1)
+        # COUNT( - агрегат; колонка comments_count сюда не попадает.
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+    def test_views_follow_cursor_links(self):
+        """Ленты отдают следующую страницу по ?after="""
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?after={cursor}')
+        response = client.get(reverse('posts:index') + f'?after={cursor}')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.ordered[self.PER_PAGE:self.PER_PAGE * 2])
+
+
+class ElidedPageRangeTests(TestCase):
+    def elided(self, number, num_pages=100):
+        page = Paginator(range(num_pages), 1).page(number)
+        return elided_page_range(page)
+
+    def test_short_range_is_full(self):
+        """Немного страниц показываются все без пропусков"""
+        self.assertEqual(self.elided(3, num_pages=7), list(range(1, 8)))
+
+    def test_window_around_current(self):
+        """Края и окно вокруг текущей, пропуски - многоточием"""
+        self.assertEqual(
+            self.elided(50), [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100])
+        self.assertEqual(self.elided(1), [1, 2, 3, ELLIPSIS, 100])
+        self.assertEqual(self.elided(100), [1, ELLIPSIS, 98, 99, 100])
+
+    def test_feed_renders_bounded_links(self):
+        """Лента по ?page= выводит окно номеров, а не все страницы"""
+        user = User.objects.create_user(username='pages')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=user) for i in range(150))
+        response = Client().get(reverse('posts:index'), {'page': 7})
+        # 1, 5, 6, 8, 9, 15 и четыре ссылки «Первая» ... «Последняя».
+        self.assertContains(response, 'href="?page=', count=10)
+        self.assertContains(response, ELLIPSIS, count=2)
+        self.assertNotContains(response, 'href="?page=12"')
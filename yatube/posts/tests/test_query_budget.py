@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import query_budget
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CACHE_SHARED=True)
+class QueryBudgetTests(TestCase):
+    '''Число запросов страниц posts и API не растёт незаметно.
+
+    Бюджеты лежат в query_budget.json; после осознанного изменения их
+    перезаписывают запуском с QUERY_BUDGET_UPDATE=1.
+    '''
+    NUM_POSTS: int = 40
+    NUM_COMMENTS: int = 15
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(4)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание')
+            for number in range(3)
+        ]
+        for number in range(cls.NUM_POSTS):
+            Post.objects.create(
+                text=f'Пост номер {number} про котиков',
+                author=cls.authors[number % len(cls.authors)],
+                group=cls.groups[number % len(cls.groups)],
+                image=f'posts/picture{number % 5}.jpg' if number % 2 else '',
+            )
+        cls.post = Post.objects.filter(author=cls.authors[0]).first()
+        for number in range(cls.NUM_COMMENTS):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.authors[number % len(cls.authors)],
+                text=f'Комментарий {number}',
+            )
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.authors[0])
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def measure(self, name, request):
+        cache.clear()
+        with self.subTest(view=name):
+            with query_budget(name):
+                response = request()
+            self.assertLess(response.status_code, 400)
+
+    def export(self, table):
+        response = self.staff_client.get(
+            reverse('posts:export', kwargs={'table': table}))
+        # Запросы потоковой выгрузки идут при чтении ответа.
+        b''.join(response.streaming_content)
+        return response
+
+    def test_read_views(self):
+        """Страницы чтения укладываются в бюджет запросов"""
+        author = self.authors[0].username
+        index = reverse('posts:index')
+        cursor = self.guest.get(index).context['page_obj'].next_cursor
+        pages = {
+            'posts:index': lambda: self.guest.get(index),
+            'posts:index?page=2': lambda: self.guest.get(
+                index, {'page': 2}),
+            'posts:index?after': lambda: self.guest.get(
+                index, {'after': cursor}),
+            'posts:group_list': lambda: self.guest.get(reverse(
+                'posts:group_list', kwargs={'slug': 'group-0'})),
+            'posts:profile': lambda: self.client.get(reverse(
+                'posts:profile', kwargs={'username': author})),
+            'posts:post_detail': lambda: self.client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk})),
+            'posts:post_comments': lambda: self.guest.get(reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.pk})),
+            'posts:follow_index': lambda: self.client.get(
+                reverse('posts:follow_index')),
+            'posts:search': lambda: self.guest.get(
+                reverse('posts:search'), {'q': 'котик'}),
+            'posts:post_create': lambda: self.client.get(
+                reverse('posts:post_create')),
+            'posts:post_edit': lambda: self.author_client.get(reverse(
+                'posts:post_edit', kwargs={'post_id': self.post.pk})),
+            'posts:export': lambda: self.export('posts'),
+            'api:index': lambda: self.guest.get(reverse('api:index')),
+            'api:group_list': lambda: self.guest.get(reverse(
+                'api:group_list', kwargs={'slug': 'group-0'})),
+            'api:profile': lambda: self.guest.get(reverse(
+                'api:profile', kwargs={'username': author})),
+            'api:post_detail': lambda: self.guest.get(reverse(
+                'api:post_detail', kwargs={'post_id': self.post.pk})),
+            'api:post_comments': lambda: self.guest.get(reverse(
+                'api:post_comments', kwargs={'post_id': self.post.pk})),
+            'api:follow_index': lambda: self.client.get(
+                reverse('api:follow_index')),
+        }
+        for name, request in pages.items():
+            self.measure(name, request)
+
+    def test_write_views(self):
+        """Изменяющие запросы укладываются в бюджет запросов"""
+        author = self.authors[3].username
+        actions = {
+            'posts:post_create POST': lambda: self.client.post(
+                reverse('posts:post_create'), {'text': 'Новый пост'}),
+            'posts:post_edit POST': lambda: self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                {'text': 'Исправленный пост'}),
+            'posts:add_comment POST': lambda: self.client.post(
+                reverse('posts:add_comment',
+                        kwargs={'post_id': self.post.pk}),
+                {'text': 'Комментарий'}),
+            'posts:profile_follow': lambda: self.client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author})),
+            'posts:profile_unfollow': lambda: self.client.get(reverse(
+                'posts:profile_unfollow', kwargs={'username': author})),
+        }
+        for name, request in actions.items():
+            self.measure(name, request)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    NUM_MATCHES: int = 15
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        for i in range(cls.NUM_MATCHES):
+            Post.objects.create(
+                text=f'Про котиков, заметка {i}', author=cls.user)
+        cls.best = Post.objects.create(
+            text='Котики, котики и ещё раз котики', author=cls.user)
+        cls.other = Post.objects.create(
+            text='Про собак', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, **params):
+        return self.client.get(reverse('posts:search'), params)
+
+    def test_ranked_prefix_match(self):
+        """Поиск находит словоформы, лучший пост первым, чужие не берёт"""
+        response = self.get(q='КОТИК')
+        page = list(response.context['page_obj'])
+        self.assertEqual(page[0], self.best)
+        self.assertNotIn(self.other, page)
+        self.assertEqual(len(page), 10)
+        self.assertContains(
+            response, '?q=%D0%9A%D0%9E%D0%A2%D0%98%D0%9A&amp;after=')
+
+    def test_cursor_pages(self):
+        """Страницы выдачи по курсору не пересекаются и покрывают всё"""
+        first = self.get(q='котик').context['page_obj']
+        second = self.get(
+            q='котик', after=first.next_cursor).context['page_obj']
+        found = list(first) + list(second)
+        self.assertEqual(len(set(found)), self.NUM_MATCHES + 1)
+        self.assertFalse(second.has_next())
+        back = self.get(
+            q='котик', before=second.previous_cursor).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_index_follows_edits(self):
+        """Правка и удаление поста сразу видны в поиске"""
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Про енотов'
+        post.save()
+        self.assertEqual(list(self.get(q='енот').context['page_obj']), [post])
+        self.assertFalse(list(self.get(q='собак').context['page_obj']))
+        post.delete()
+        self.assertFalse(list(self.get(q='енот').context['page_obj']))
+
+    def test_empty_query(self):
+        """Пустой запрос и запрос из знаков препинания ничего не находят"""
+        for query in ('', '"*:( OR'):
+            with self.subTest(query=query):
+                response = self.get(q=query)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(list(response.context['page_obj']))
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        admin = site._registry[Post]
+        request = RequestFactory().get('/admin/posts/post/', {'q': 'собак'})
+        queryset, distinct = admin.get_search_results(
+            request, Post.objects.all(), 'собак')
+        self.assertEqual(list(queryset), [self.other])
+        self.assertFalse(distinct)
+        if search.backend() != 'like':
+            self.assertNotIn('LIKE', str(queryset.query).upper())
+
+    def test_pages_reach_matches_beyond_rank_window(self):
+        """Старые совпадения за окном ранжирования тоже листаются"""
+        with mock.patch.object(search, 'RANK_WINDOW', 4):
+            pages = [self.get(q='котик').context['page_obj']]
+            while pages[-1].has_next():
+                pages.append(self.get(
+                    q='котик', after=pages[-1].next_cursor
+                ).context['page_obj'])
+            found = [post for page in pages for post in page]
+            self.assertEqual(len(found), self.NUM_MATCHES + 1)
+            self.assertEqual(len(set(found)), len(found))
+            back = self.get(
+                q='котик', before=pages[1].previous_cursor
+            ).context['page_obj']
+            self.assertEqual(list(back), list(pages[0]))
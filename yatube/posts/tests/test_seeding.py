@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from ..models import (Comment, Follow, Post, StoredImage, ThumbnailTask,
+                      TimelineEntry, UserStats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedBenchTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed(self):
+        """seed_bench создаёт данные и пересобирает производные таблицы"""
+        call_command(
+            'seed_bench', users=30, groups=3, posts=200, comments=100,
+            follows=5, image_share=0.5, distinct_images=2,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            top.posts_count, Post.objects.filter(author=top.user).count())
+        self.assertGreater(top.posts_count, 200 / 30)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(StoredImage.objects.count(), 2)
+        self.assertEqual(ThumbnailTask.objects.count(), 2)
@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, UserStats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_views(self):
+        """Создание постов, комментариев и подписок двигает счётчики"""
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        reader, author = self.stats(self.user), self.stats(self.author)
+        self.assertEqual(reader.posts_count, 1)
+        self.assertEqual(reader.comments_count, 1)
+        self.assertEqual(reader.following_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_stats исправляет разошедшиеся счётчики"""
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('reconcile_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_pages_do_not_count(self):
+        """Профиль и пост выводят счётчики без COUNT-запросов"""
+        pages = {
+            reverse('posts:profile', kwargs={'username': 'author'}):
+                'Всего постов: 1',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                '<span >1</span>',
+        }
+        for url, counter in pages.items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, counter)
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+
+from .. import caching, images
+from ..models import Post, StoredImage, ThumbnailTask
+from ..storage import is_hashed, post_image_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, filename):
+        self.client.post(reverse('posts:post_create'), {
+            'text': filename,
+            'image': SimpleUploadedFile(
+                name=filename, content=SMALL_GIF, content_type='image/gif'),
+        })
+        return Post.objects.get(text=filename)
+
+    def test_same_upload_is_stored_once(self):
+        """Одна картинка в двух постах хранится одним файлом"""
+        first, second = self.upload('cat.gif'), self.upload('copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertEqual(ThumbnailTask.objects.count(), 1)
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.refs, 2)
+        self.assertEqual(stored.size, len(SMALL_GIF))
+        Post.objects.create(
+            text='Третий', author=self.user, image=first.image.name)
+        self.assertEqual(StoredImage.objects.get().refs, 3)
+
+    def test_acquire_after_concurrent_create(self):
+        """Запись, созданная параллельным запросом, получает ссылку"""
+        StoredImage.objects.create(name='posts/cat.gif', size=1, refs=1)
+        filter_ = StoredImage.objects.filter
+        missed = []
+
+        def racing_filter(*args, **kwargs):
+            # Первый UPDATE не видит запись: её ещё не закоммитили.
+            if not missed:
+                missed.append(True)
+                return filter_(*args, **kwargs).none()
+            return filter_(*args, **kwargs)
+
+        with mock.patch.object(
+                StoredImage.objects, 'filter', side_effect=racing_filter):
+            images.acquire('posts/cat.gif')
+        self.assertEqual(StoredImage.objects.get().refs, 2)
+
+    def test_concurrent_save_returns_stored_name(self):
+        """Файл, записанный параллельно, не получает второго имени"""
+        name = post_image_storage.save('cat.gif', ContentFile(SMALL_GIF))
+        exists = post_image_storage.exists
+        checked = []
+
+        def racing_exists(name):
+            # Первая проверка не видит файл: его пишет другой запрос.
+            if not checked:
+                checked.append(name)
+                return False
+            return exists(name)
+
+        with mock.patch.object(
+                post_image_storage, 'exists', side_effect=racing_exists):
+            again = post_image_storage.save(
+                'copy.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(again, name)
+        directory = os.path.dirname(post_image_storage.path(name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется только вместе с последним постом"""
+        first, second = self.upload('cat.gif'), self.upload('copy.gif')
+        name = first.image.name
+        Post.objects.get(pk=first.pk).delete()
+        self.assertEqual(images.delete_if_unused(name), 0)
+        self.assertTrue(post_image_storage.exists(name))
+        Post.objects.get(pk=second.pk).delete()
+        self.assertEqual(images.delete_if_unused(name), len(SMALL_GIF))
+        self.assertFalse(post_image_storage.exists(name))
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertFalse(ThumbnailTask.objects.exists())
+
+    def test_dedupe_media_merges_old_files(self):
+        """dedupe_media переносит старые файлы и сливает дубликаты"""
+        legacy = FileSystemStorage()
+        names = [
+            legacy.save(f'posts/{name}', ContentFile(SMALL_GIF))
+            for name in ('a.gif', 'b.gif')
+        ]
+        for name in names:
+            Post.objects.create(text=name, author=self.user, image=name)
+        out = StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertIn(f'байт: {len(SMALL_GIF)}', out.getvalue())
+        self.assertTrue(all(legacy.exists(name) for name in names))
+        cards = [
+            caching.card_key(pk, 'gp')
+            for pk in Post.objects.values_list('pk', flat=True)
+        ]
+        cache.set_many({key: ('version', 'card') for key in cards})
+        before = caching.generation(caching.POSTS_SCOPE)
+        with on_commit_callbacks():
+            call_command('dedupe_media', stdout=StringIO())
+        self.assertNotEqual(caching.generation(caching.POSTS_SCOPE), before)
+        self.assertEqual(cache.get_many(cards), {})
+        merged = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(merged), 1)
+        name = merged.pop()
+        self.assertTrue(is_hashed(name))
+        self.assertTrue(os.path.exists(post_image_storage.path(name)))
+        self.assertFalse(any(legacy.exists(name) for name in names))
+        self.assertEqual(StoredImage.objects.get(name=name).refs, 2)
+        self.assertTrue(ThumbnailTask.objects.filter(image=name).exists())
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, ThumbnailTask
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+            b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='small.gif', content=small_gif,
+                content_type='image/gif'),
+        })
+        self.post = Post.objects.get()
+
+    def test_create_enqueues_and_shows_original(self):
+        """Новый пост ставит задачу и до её выполнения показывает оригинал"""
+        task = ThumbnailTask.objects.get(image=self.post.image.name)
+        self.assertEqual(task.status, ThumbnailTask.PENDING)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{self.post.image.url}"')
+
+    def test_worker_makes_thumbnails(self):
+        """Обработчик делает миниатюру, и лента начинает её показывать"""
+        call_command('thumbnail_worker', '--once')
+        task = ThumbnailTask.objects.get(image=self.post.image.name)
+        self.assertEqual(task.status, ThumbnailTask.DONE)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, f'src="{self.post.image.url}"')
+        self.assertContains(response, 'srcset=')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f'.w{width}.png {width}w')
+
+    def test_thumbnail_until_derivatives(self):
+        """Без адаптивных копий показывается миниатюра sorl"""
+        call_command('thumbnail_worker', '--once')
+        ThumbnailTask.objects.update(variants='')
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{settings.MEDIA_URL}cache/')
+
+    def test_feed_looks_up_derivatives_once_per_page(self):
+        """Копии картинок страницы ищутся одним запросом"""
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост {i}', author=self.user, image=f'posts/{i}.gif')
+        cache.clear()
+        tasks = ThumbnailTask._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        lookups = [
+            query for query in queries.captured_queries
+            if f'FROM "{tasks}"' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_feed_looks_up_thumbnails_once_per_page(self):
+        """Миниатюры картинок страницы ищутся одним запросом"""
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост {i}', author=self.user, image=f'posts/{i}.gif')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        lookups = [
+            query for query in queries.captured_queries
+            if 'FROM "thumbnail_kvstore"' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.assertContains(response, f'src="{self.post.image.url}"')
@@ -0,0 +1,163 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, UserStats
+from ..paginators import TimelinePaginator
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        """Подписка дописывает старые посты, отписка их убирает"""
+        self.follow(self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_heavy_author_read_on_fan_out(self):
+        """Посты популярного автора подмешиваются при чтении"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertIn(new_post, timeline.feed_for(self.reader))
+
+    def test_rebuild_command(self):
+        """Команда пересборки восстанавливает ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(timeline.feed_for(self.reader)), [self.old_post])
+
+    def test_feed_pages_by_timeline_date(self):
+        """Курсор ленты сравнивает дату записи ленты, а не поста"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        paginator = TimelinePaginator(timeline.feed_for(self.reader), 1)
+        first = paginator.get_cursor_page()
+        self.assertEqual(list(first), [new_post])
+        entries = TimelineEntry._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(second), [self.old_post])
+        sql = queries.captured_queries[0]['sql']
+        self.assertIn(f'"{entries}"."pub_date" <', sql)
+        self.assertIn('ORDER BY "feed_date" DESC', sql)
+
+    def test_rebuild_is_atomic(self):
+        """Сбой вставки при пересборке не оставляет пустых лент"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(
+                timeline, '_insert_select', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                timeline.rebuild()
+        self.assertEqual(
+            list(timeline.feed_for(self.reader)), [self.old_post])
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_FANOUT_RESUME=1)
+class HeavyAuthorTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        cls.old_post = Post.objects.create(text='Старый', author=cls.author)
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+
+    def fan_out(self):
+        return UserStats.objects.get(user=self.author).fan_out
+
+    def unfollow(self, reader):
+        Follow.objects.get(user=reader, author=self.author).delete()
+
+    def test_limit_stops_fan_out(self):
+        """Подписчик сверх лимита выключает раскладку"""
+        self.assertFalse(self.fan_out())
+        heavy_post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=heavy_post).exists())
+        self.assertEqual(
+            list(timeline.feed_for(self.readers[0])),
+            [heavy_post, self.old_post])
+
+    def test_unfollow_does_not_refill(self):
+        """Отписка на границе лимита ленты не пересобирает"""
+        entries = list(TimelineEntry.objects.filter(
+            user=self.readers[0]).values_list('pk', flat=True))
+        with mock.patch.object(timeline, '_insert_select') as insert:
+            self.unfollow(self.readers[2])
+        insert.assert_not_called()
+        self.assertFalse(self.fan_out())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.readers[0]).values_list('pk', flat=True)),
+            entries)
+
+    def test_resume_below_threshold(self):
+        """Ниже порога команда дописывает в ленты только недостающее"""
+        heavy_post = Post.objects.create(text='Пост', author=self.author)
+        kept = set(TimelineEntry.objects.filter(
+            post=self.old_post).values_list('pk', flat=True))
+        self.unfollow(self.readers[2])
+        call_command('resume_fan_out', stdout=StringIO())
+        self.assertFalse(self.fan_out())
+        self.unfollow(self.readers[1])
+        out = StringIO()
+        call_command('resume_fan_out', stdout=out)
+        self.assertIn('авторам: 1', out.getvalue())
+        self.assertTrue(self.fan_out())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.readers[0])
+                 .order_by('-pub_date').values_list('post_id', flat=True)),
+            [heavy_post.pk, self.old_post.pk])
+        self.assertTrue(kept & set(TimelineEntry.objects.filter(
+            post=self.old_post).values_list('pk', flat=True)))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user__in=self.readers[1:]).exists())
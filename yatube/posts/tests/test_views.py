@@ -7,10 +7,15 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Group, Post
+from core.testing import on_commit_callbacks
+
+from .. import caching
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -62,6 +67,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -195,10 +201,10 @@ class PostPagesTests(TestCase):
         '''Проверка кеша'''
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
+        Post.objects.bulk_create([Post(
             text='test_new_post',
             author=self.user,
-        )
+        )])
         response_old = self.authorized_client.get(reverse('posts:index'))
         old_posts = response_old.content
         self.assertEqual(old_posts, posts)
@@ -207,6 +213,39 @@ class PostPagesTests(TestCase):
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
 
+    def test_cache_index_invalidated_on_change(self):
+        '''Кеш ленты сбрасывается при изменении постов'''
+        response = self.authorized_client.get(reverse('posts:index'))
+        with on_commit_callbacks():
+            Post.objects.create(
+                text='test_new_post',
+                author=self.user,
+            )
+        response_new = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_new.content)
+        self.assertContains(response_new, 'test_new_post')
+
+    def test_cache_generation_waits_for_commit(self):
+        '''Поколение лент сдвигается только после коммита записи'''
+        before = caching.generation(caching.POSTS_SCOPE)
+        with on_commit_callbacks():
+            Post.objects.create(text='test_new_post', author=self.user)
+            self.assertEqual(
+                caching.generation(caching.POSTS_SCOPE), before)
+        self.assertNotEqual(caching.generation(caching.POSTS_SCOPE), before)
+
+    def test_cache_pages_do_not_share_key(self):
+        '''Разные страницы ленты кешируются под разными ключами'''
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=self.user) for i in range(10)
+        ])
+        cache.clear()
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(
+            reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
+
     def test_follow_auth(self):
         """Проверка прав на подписку/отписку авторизованного пользователя"""
         response = self.authorized_client.post(
@@ -317,3 +356,77 @@ class PaginatorViewsTest(TestCase):
             'posts:profile', kwargs={'username': 'SanyaMochalin'}) + '?page=2')
         self.assertEqual(len(
             response.context['page_obj']), amount_second_page)
+
+
+class FeedQueriesTest(TestCase):
+    '''Число запросов страницы не зависит от числа постов на ней.'''
+    MAX_QUERIES: int = 8
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def add_posts(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            Post.objects.create(
+                text=f'Пост {i}', author=self.author, group=self.group)
+            Comment.objects.create(
+                text=f'Комментарий {i}', author=commenter, post=self.post)
+
+    def count_queries(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        counts = {}
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_queries_do_not_grow_with_page_size(self):
+        """Ленты и страница поста не делают запросов на каждый пост"""
+        self.add_posts(2)
+        few = self.count_queries()
+        self.add_posts(10)
+        many = self.count_queries()
+        for url, count in many.items():
+            with self.subTest(url=url):
+                self.assertEqual(count, few[url])
+                self.assertLessEqual(count, self.MAX_QUERIES)
+
+    def test_cached_feed_page_skips_posts_query(self):
+        """Закешированная страница ленты не выбирает посты повторно"""
+        posts_table = Post._meta.db_table
+        for url in (reverse('posts:index'), reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                cache.clear()
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, self.post.text)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if f'FROM "{posts_table}"' in query['sql']
+                ])
@@ -0,0 +1,214 @@
+'''Фоновая подготовка миниатюр картинок постов.
+
+Веб-процесс не открывает и не пережимает картинки: после сохранения
+поста в очередь ThumbnailTask ставится задача, а команда
+thumbnail_worker делает по ней миниатюры всех размеров из
+settings.POST_THUMBNAILS и адаптивные копии (см. derivatives). Пока
+миниатюры нет, шаблоны показывают оригинал.
+'''
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.shortcuts import delete as sorl_delete
+
+from . import caching, derivatives
+from .models import Post, ThumbnailTask
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS: int = 3
+BATCH_SIZE: int = 10
+# Задача в работе дольше этого срока считается брошенной упавшим
+# обработчиком и возвращается в очередь.
+STALE_AFTER = timedelta(minutes=10)
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    '''Бэкенд sorl, который умеет искать миниатюру, не создавая её.'''
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        '''Файл миниатюры, которую сделал бы get_thumbnail.'''
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+def ready_thumbnail(image, preset):
+    '''Готовая миниатюра или None, если её ещё не сделали.'''
+    geometry, options = settings.POST_THUMBNAILS[preset]
+    return default.backend.get_ready_thumbnail(image, geometry, **options)
+
+
+def ready_thumbnails(images, preset):
+    '''Готовые миниатюры пачки картинок: {имя: миниатюра или None}.
+
+    Записи хранилища sorl читаются одним get_many из его кеша и одним
+    запросом к базе для промахов, а не поиском на каждую картинку.
+    '''
+    store = default.kvstore
+    if not isinstance(store, CachedKVStore):
+        return {image.name: ready_thumbnail(image, preset) for image in images}
+    geometry, options = settings.POST_THUMBNAILS[preset]
+    keys = {
+        image.name: add_prefix(default.backend.thumbnail_file(
+            image, geometry, **options).key)
+        for image in images
+    }
+    values = store.cache.get_many(list(keys.values()))
+    missing = [key for key in keys.values() if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value'))
+        # Как и sorl, запоминаем и отсутствие записи.
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        store.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        name: (
+            None if values[key] in (EMPTY_VALUE, None, '')
+            else deserialize_image_file(values[key]))
+        for name, key in keys.items()
+    }
+
+
+def enqueue(image):
+    '''Ставит картинку в очередь на подготовку миниатюр.
+
+    Для уже обработанного содержимого (та же картинка в другом посте)
+    задача не ставится: готовые миниатюры привязаны к имени файла.
+    '''
+    if not image:
+        return
+    task, created = ThumbnailTask.objects.get_or_create(image=image.name)
+    if not created and task.status == ThumbnailTask.FAILED:
+        ThumbnailTask.objects.filter(pk=task.pk).update(
+            status=ThumbnailTask.PENDING, attempts=0, error='')
+
+
+def enqueue_missing():
+    '''Ставит в очередь картинки постов, для которых задачи ещё нет.'''
+    names = (
+        Post.objects.exclude(image='').order_by()
+        .exclude(image__in=ThumbnailTask.objects.values('image'))
+        .values_list('image', flat=True).distinct()
+    )
+    # Размер пачки INSERT выбирает Django: у SQLite он ограничен.
+    tasks = [ThumbnailTask(image=name) for name in names]
+    ThumbnailTask.objects.bulk_create(tasks, ignore_conflicts=True)
+    return len(tasks)
+
+
+def _claim(task):
+    '''Забирает задачу, если её не успел забрать другой обработчик.'''
+    return ThumbnailTask.objects.filter(
+        pk=task.pk, status=ThumbnailTask.PENDING
+    ).update(status=ThumbnailTask.RUNNING, updated=timezone.now())
+
+
+def release_stale():
+    return ThumbnailTask.objects.filter(
+        status=ThumbnailTask.RUNNING,
+        updated__lt=timezone.now() - STALE_AFTER,
+    ).update(status=ThumbnailTask.PENDING)
+
+
+def source_file(name):
+    '''Картинка поста для sorl: ключи миниатюр зависят от хранилища.'''
+    return ImageFile(name, post_image_storage)
+
+
+def generate(name):
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        default.backend.get_thumbnail(source_file(name), geometry, **options)
+
+
+def delete_thumbnails(task):
+    '''Удаляет миниатюры и адаптивные копии картинки вместе с задачей.'''
+    sorl_delete(source_file(task.image), delete_file=False)
+    derivatives.delete(task.image, json.loads(task.variants or '[]'))
+    task.delete()
+    transaction.on_commit(lambda: derivatives.forget(task.image))
+
+
+def process(task):
+    try:
+        generate(task.image)
+        task.variants = json.dumps(derivatives.generate(task.image))
+    except Exception as error:
+        logger.exception('Не удалось сделать миниатюры для %s', task.image)
+        task.attempts += 1
+        task.error = str(error)
+        task.status = (
+            ThumbnailTask.FAILED if task.attempts >= MAX_ATTEMPTS
+            else ThumbnailTask.PENDING
+        )
+    else:
+        task.status = ThumbnailTask.DONE
+        task.error = ''
+    task.save(update_fields=(
+        'status', 'attempts', 'error', 'variants', 'updated'))
+    if task.status != ThumbnailTask.DONE:
+        return False
+    transaction.on_commit(lambda: published(task.image))
+    return True
+
+
+def published(name):
+    '''Копии готовы: сбрасывает их кеш и ленты, где ещё оригинал.
+
+    Вызывается после коммита задачи, иначе читатель успеет закешировать
+    её прежнее состояние.
+    '''
+    derivatives.forget(name)
+    caching.bump_generation(caching.POSTS_SCOPE)
+
+
+def run_pending(batch_size=BATCH_SIZE):
+    '''Обрабатывает пачку задач, возвращает число обработанных.'''
+    tasks = ThumbnailTask.objects.filter(
+        status=ThumbnailTask.PENDING).order_by('created')[:batch_size]
+    processed = 0
+    for task in tasks:
+        if _claim(task):
+            process(task)
+            processed += 1
+    return processed
+
+
+def work(sleep, once=False, batch_size=BATCH_SIZE):
+    '''Разбирает очередь; с once=True выходит, когда она опустеет.'''
+    release_stale()
+    while True:
+        if run_pending(batch_size):
+            continue
+        if once:
+            return
+        time.sleep(sleep)
@@ -0,0 +1,246 @@
+'''Материализованная лента подписок (fan-out-on-write).
+
+Каждый новый пост раскладывается в ленты подписчиков автора, поэтому
+страница `/follow/` читает готовый диапазон из индекса
+(user, pub_date) вместо соединения Post/User/Follow. Для авторов,
+у которых подписчиков больше TIMELINE_FANOUT_LIMIT, раскладка
+выключается (UserStats.fan_out): их посты подмешиваются в ленту при
+чтении. Обратно раскладка включается не на самом лимите, а когда
+подписчиков не больше TIMELINE_FANOUT_RESUME, и не в запросе отписки:
+команда resume_fan_out по расписанию дописывает в ленты недостающие
+записи таких авторов. Подписка и отписка на границе лимита поэтому
+ничего не пересобирают.
+'''
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE: int = 1000
+# Запас на посты, которые писались во время resume и закоммичены после.
+RESUME_MARGIN: timedelta = timedelta(minutes=1)
+
+
+def is_heavy_author(author_id):
+    '''Слишком много подписчиков для раскладки при записи.'''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if not limit:
+        return False
+    return UserStats.objects.filter(user_id=author_id, fan_out=False).exists()
+
+
+def heavy_authors_for(user):
+    '''Авторы из подписок пользователя, чьи посты читаются напрямую.'''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if not limit:
+        return []
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return list(
+        UserStats.objects.filter(user_id__in=followed, fan_out=False)
+        .values_list('user_id', flat=True)
+    )
+
+
+def _bulk_insert(entries):
+    # Размер пачки INSERT выбирает Django: у SQLite он ограничен.
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out_post(post, batch_size=BATCH_SIZE):
+    '''Раскладывает новый пост в ленты подписчиков автора.'''
+    if is_heavy_author(post.author_id):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    entries = []
+    for user_id in followers:
+        entries.append(TimelineEntry(
+            user_id=user_id,
+            author_id=post.author_id,
+            post_id=post.pk,
+            pub_date=post.pub_date,
+        ))
+        if len(entries) >= batch_size:
+            _bulk_insert(entries)
+            entries = []
+    if entries:
+        _bulk_insert(entries)
+
+
+def backfill(user_id, author_id, batch_size=BATCH_SIZE):
+    '''Добавляет в ленту читателя уже опубликованные посты автора.'''
+    if is_heavy_author(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by()
+        .values_list('pk', 'pub_date')
+        .iterator(chunk_size=batch_size)
+    )
+    entries = []
+    for post_id, pub_date in posts:
+        entries.append(TimelineEntry(
+            user_id=user_id,
+            author_id=author_id,
+            post_id=post_id,
+            pub_date=pub_date,
+        ))
+        if len(entries) >= batch_size:
+            _bulk_insert(entries)
+            entries = []
+    if entries:
+        _bulk_insert(entries)
+
+
+def _insert_select(where='', params=(), missing=False):
+    '''Раскладывает посты по лентам подписчиков одним INSERT ... SELECT.
+
+    С missing=True вставляются только записи, которых в лентах ещё нет.
+    '''
+    entry, follow, post, stats = (
+        model._meta.db_table
+        for model in (TimelineEntry, Follow, Post, UserStats)
+    )
+    sql = (
+        f'INSERT INTO {entry} (user_id, author_id, post_id, pub_date) '
+        f'SELECT f.user_id, f.author_id, p.id, p.pub_date '
+        f'FROM {follow} f INNER JOIN {post} p ON p.author_id = f.author_id'
+    )
+    conditions, params = ([where], list(params)) if where else ([], [])
+    if missing:
+        conditions.append(
+            f'NOT EXISTS (SELECT 1 FROM {entry} e '
+            f'WHERE e.user_id = f.user_id AND e.post_id = p.id)'
+        )
+    if settings.TIMELINE_FANOUT_LIMIT:
+        conditions.append(
+            f'f.author_id NOT IN (SELECT user_id FROM {stats} '
+            f'WHERE fan_out = %s)'
+        )
+        params.append(False)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def follower_gained(author_id):
+    '''Подписка: автор поднялся выше лимита - раскладка выключается.
+
+    Вызывается после увеличения followers_count.
+    '''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if limit:
+        UserStats.objects.filter(
+            user_id=author_id, fan_out=True, followers_count__gt=limit,
+        ).update(fan_out=False)
+
+
+def _resumable():
+    '''Авторы без раскладки, которым её можно вернуть.'''
+    stats = UserStats.objects.filter(fan_out=False)
+    if settings.TIMELINE_FANOUT_LIMIT:
+        stats = stats.filter(
+            followers_count__lte=settings.TIMELINE_FANOUT_RESUME)
+    return stats
+
+
+def resume(author_id):
+    '''Включает автору раскладку и дописывает недостающие записи лент.
+
+    Пока раскладки не было, новые посты и подписки автора в ленты не
+    попадали. Флаг и вставка идут в одной транзакции: читатель видит
+    посты автора либо подмешанными, либо уже в ленте. Пост или подписка,
+    которые писались одновременно, могли застать старый флаг, поэтому
+    после коммита короткий проход дописывает посты и подписки, новые
+    относительно начала. Возвращает False, если автору раскладку
+    возвращать рано.
+    '''
+    started = connection.ops.adapt_datetimefield_value(
+        timezone.now() - RESUME_MARGIN)
+    last_follow = (
+        Follow.objects.order_by('-pk').values_list('pk', flat=True).first()
+        or 0)
+    with transaction.atomic():
+        if not _resumable().filter(user_id=author_id).update(fan_out=True):
+            return False
+        _insert_select('f.author_id = %s', [author_id], missing=True)
+    _insert_select(
+        'f.author_id = %s AND p.pub_date >= %s', [author_id, started],
+        missing=True)
+    _insert_select(
+        'f.author_id = %s AND f.id > %s', [author_id, last_follow],
+        missing=True)
+    return True
+
+
+def resume_fan_out():
+    '''Возвращает раскладку всем авторам ниже порога, возвращает их число.'''
+    authors = list(_resumable().values_list('user_id', flat=True))
+    return sum(resume(author_id) for author_id in authors)
+
+
+def purge(user_id, author_id):
+    '''Убирает посты автора из ленты отписавшегося читателя.'''
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    '''Пересобирает все ленты с нуля, возвращает число подписок.
+
+    Записи вставляются одним INSERT ... SELECT: через объекты модели
+    сотни тысяч записей ленты собирались бы минутами. Раскладка
+    выключается ровно авторам выше лимита. Очистка и вставка идут в
+    одной транзакции: читатели не видят пустых лент.
+    '''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    with transaction.atomic():
+        if limit:
+            UserStats.objects.filter(
+                fan_out=True, followers_count__gt=limit).update(fan_out=False)
+            UserStats.objects.filter(
+                fan_out=False, followers_count__lte=limit).update(fan_out=True)
+        TimelineEntry.objects.all().delete()
+        _insert_select()
+    return Follow.objects.count()
+
+
+def fill():
+    '''Дописывает в ленты недостающие записи после массовой вставки.
+
+    В отличие от rebuild, ленты не очищаются: вставляются только
+    записи, которых нет. Авторам, которые поднялись выше лимита,
+    раскладка выключается; обратно её возвращает resume_fan_out.
+    '''
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    with transaction.atomic():
+        if limit:
+            UserStats.objects.filter(
+                fan_out=True, followers_count__gt=limit).update(fan_out=False)
+        _insert_select(missing=True)
+
+
+def feed_for(user):
+    '''Посты ленты подписок пользователя, новые первыми.
+
+    Дата записи ленты приходит в feed_date: TimelinePaginator ставит
+    курсор по ней, и страница читается диапазоном индекса
+    (user, pub_date) ленты, а не индексом постов.
+    '''
+    heavy = heavy_authors_for(user)
+    if not heavy:
+        posts = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'))
+    else:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.filter(
+            Q(pk__in=entries) | Q(author_id__in=heavy)
+        ).annotate(feed_date=F('pub_date'))
+    return posts.order_by('-feed_date', '-pk')
@@ -1,28 +1,70 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, QueryDict, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core import routers, stampede
+from core.routers import read_replica
+
+from . import export, thumbnails, timeline
+from .caching import feed_page_key, feed_timeout, feed_version
+from .conditional import (conditional, feed_validators, post_validators,
+                          profile_validators)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
+from .paginators import (CommentPaginator, CursorPaginator,
+                         TimelinePaginator, detach, elided_page_range)
+from .search import SearchPaginator
 
 User = get_user_model()
 
 NUM_POSTS_NEED: int = 10
+NUM_COMMENTS_NEED: int = 20
 
 
-def paginator_page(request, list, num):
-    pag = Paginator(list, num)
+def paginator_page(request, list, num, paginator_class=CursorPaginator):
+    '''Страница ленты: по курсору, а по старым ссылкам ?page=N - по номеру'''
+    after = request.GET.get('after')
+    before = request.GET.get('before')
     page_num = request.GET.get('page')
-    page_with_pag = pag.get_page(page_num)
+    if page_num is not None and not (after or before):
+        pag = Paginator(list, num)
+        page_with_pag = pag.get_page(page_num)
+        page_with_pag.elided_range = elided_page_range(page_with_pag)
+        return page_with_pag
+    pag = paginator_class(list, num)
+    page_with_pag = pag.get_cursor_page(after, before)
     return page_with_pag
 
 
+def feed_page(request, feed, vary_on, posts,
+              paginator_class=CursorPaginator):
+    '''Страница ленты из кеша лент.
+
+    Запрос постов выполняется внутри пересчёта под замком
+    core.stampede, и в кеш ложатся сами посты с курсорами, а не только
+    HTML: при истечении записи базу снова спрашивает один запрос.
+    '''
+    def build():
+        return detach(paginator_page(
+            request, posts, NUM_POSTS_NEED, paginator_class))
+
+    key = feed_page_key(feed, [*vary_on, 'page'], request)
+    cached = stampede.refresh if routers.pinned() else stampede.get_or_set
+    return cached(
+        key, build, feed_timeout(feed), version=feed_version(feed, vary_on))
+
+
+@read_replica
+@conditional(feed_validators)
 def index(request):
     '''Главная страница'''
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = paginator_page(request, posts, NUM_POSTS_NEED)
+    posts = Post.objects.for_feed()
+    page_obj = feed_page(request, 'index', (), posts)
     follow_index = True
     switcher = True
     context = {
@@ -33,11 +75,13 @@ def index(request):
     return render(request, template, context)
 
 
+@read_replica
+@conditional(feed_validators)
 def group_posts(request, slug):
     '''Вывод списка для определенной группы'''
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginator_page(request, posts, NUM_POSTS_NEED)
+    posts = group.posts.for_feed()
+    page_obj = feed_page(request, 'group_list', (group.pk,), posts)
     template = 'posts/group_list.html'
     context = {
         'page_obj': page_obj,
@@ -46,10 +90,13 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@read_replica
+@conditional(profile_validators)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginator_page(request, posts, NUM_POSTS_NEED)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    posts = author.posts.for_feed()
+    page_obj = feed_page(request, 'profile', (author.pk,), posts)
     template = 'posts/profile.html'
     followers = (
         request.user.is_authenticated and Follow.objects.filter(
@@ -63,13 +110,26 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    '''Страница комментариев поста по курсору из ?after= или ?before='''
+    pag = CommentPaginator(
+        Comment.objects.filter(post_id=post_id).for_feed(),
+        NUM_COMMENTS_NEED)
+    return pag.get_cursor_page(
+        request.GET.get('after'), request.GET.get('before'))
+
+
+@read_replica
+@conditional(post_validators)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().with_author_stats(), pk=post_id)
     form = CommentForm(None)
-    comments = post.comments.all()
+    comments = comments_page(request, post.pk)
     template = 'posts/post_detail.html'
     context = {
         'post': post,
+        'post_id': post.pk,
         'comments': comments,
         'form': form,
     }
@@ -77,7 +137,61 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@read_replica
+@conditional(post_validators)
+def post_comments(request, post_id):
+    '''Следующие комментарии поста фрагментом HTML для подгрузки'''
+    comments = comments_page(request, post_id)
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    template = 'includes/comments.html'
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    '''Поиск по текстам постов, самые подходящие первыми'''
+    query = request.GET.get('q', '').strip()
+    pag = SearchPaginator(query, NUM_POSTS_NEED)
+    page_obj = pag.get_cursor_page(
+        request.GET.get('after'), request.GET.get('before'))
+    params = QueryDict(mutable=True)
+    params['q'] = query
+    template = 'posts/search.html'
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_params': params.urlencode() + '&',
+    }
+    return render(request, template, context)
+
+
+def int_param(request, name):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+@staff_member_required
+def export_table(request, table):
+    '''Потоковая выгрузка таблицы для сотрудников'''
+    format = request.GET.get('format', 'ndjson')
+    if table not in export.TABLES or format not in export.FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        export.lines(table, format, int_param(request, 'start'),
+                     int_param(request, 'end')),
+        content_type=export.CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{format}"')
+    return response
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
@@ -86,6 +200,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        thumbnails.enqueue(post.image)
         return redirect('posts:profile', request.user.username)
 
     template = 'posts/create_post.html'
@@ -109,6 +224,8 @@ def post_edit(request, post_id):
                     instance=post)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post.image)
         return redirect('posts:post_detail', post_id=post.id)
     context = {
         'form': form,
@@ -119,6 +236,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -130,10 +248,12 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_page(request, posts, NUM_POSTS_NEED)
+    posts = timeline.feed_for(request.user).for_feed()
+    page_obj = feed_page(
+        request, 'follow', (request.user.pk,), posts, TimelinePaginator)
     template = 'posts/follow.html'
     context = {
         'page_obj': page_obj,
@@ -142,6 +262,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -153,6 +274,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follower = Follow.objects.filter(user=request.user, author=author)
@@ -53,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    # Раньше сессий: запись сессии тоже привязывает клиента к default.
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,11 +68,19 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Разобранные шаблоны хранятся в памяти процесса; при отладке шаблоны
+# читаются заново, чтобы правки были видны без перезапуска.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -78,9 +89,13 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
+# Разобрать шаблоны проекта и заполнить URL-резолвер при старте
+# процесса (core.apps), а не на первых запросах воркера.
+TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', str(not DEBUG)) == 'True'
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -92,12 +107,53 @@ DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postresql'),
         'NAME': os.getenv('DB_NAME'),
-	'USER': os.getenv('POSTGRES_USER'),
-	'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
-	'HOST': os.getenv('DB_HOST'),
-	'PORT': os.getenv('DB_PORT')
+        'USER': os.getenv('POSTGRES_USER'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
+        'HOST': os.getenv('DB_HOST'),
+        'PORT': os.getenv('DB_PORT'),
+        # Сколько секунд воркер держит соединение между запросами:
+        # 0 - закрывать после каждого запроса, None - без срока.
+        'CONN_MAX_AGE': (
+            None if os.getenv('DB_CONN_MAX_AGE') == 'None'
+            else int(os.getenv('DB_CONN_MAX_AGE', 60))),
+        # Проверять соединение перед запросом (core.db).
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'),
     }
 }
+# Пул соединений в процессе для PostgreSQL; 0 - без пула.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+if DB_POOL_SIZE and DATABASES['default']['ENGINE'] == (
+        'django.db.backends.postgresql'):
+    DATABASES['default'].update({
+        'ENGINE': 'core.backends.postgresql_pool',
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': DB_POOL_SIZE,
+        },
+        # В конце запроса соединение возвращается в пул.
+        'CONN_MAX_AGE': 0,
+    })
+# Писать в лог число открытых соединений каждые N запросов; 0 - нет.
+DB_CONNECTION_LOG_EVERY = int(os.getenv('DB_CONNECTION_LOG_EVERY', 0))
+# Реплики для чтения (core.routers): хосты PostgreSQL через запятую,
+# для SQLite - пути к файлам. Остальные настройки - как у default.
+DB_REPLICA_ALIASES = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    field = 'NAME' if 'sqlite3' in DATABASES['default']['ENGINE'] else 'HOST'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        field: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICA_ALIASES.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает только с default.
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+# Через сколько секунд снова пробовать недоступную реплику.
+DB_REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
 
 
 # Password validation
@@ -145,8 +201,68 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кеш. Без CACHE_BACKEND - LocMemCache, свой у каждого процесса; для
+# нескольких воркеров нужен общий: filebased (CACHE_LOCATION - каталог),
+# db (таблица, создаётся manage.py createcachetable), memcached (адреса
+# через запятую) или django_redis.cache.RedisCache (redis://...).
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+if 'memcached' in CACHE_BACKEND:
+    CACHE_LOCATION = CACHE_LOCATION.split(',')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
     }
 }
+# Общий ли кеш для всех процессов. Ответы 304 (posts.conditional)
+# сверяются с поколениями в кеше, и с LocMemCache у каждого воркера они
+# свои: включайте CACHE_SHARED с ним, только если воркер один.
+CACHE_SHARED = os.getenv('CACHE_SHARED', str(
+    'locmem' not in CACHE_BACKEND and 'dummy' not in CACHE_BACKEND
+)) == 'True'
+# Время жизни закешированных страниц лент, секунды. Страницы
+# сбрасываются при изменении данных, поэтому срок может быть долгим.
+FEED_CACHE_TIMEOUTS = {
+    'default': 300,
+    'index': int(os.getenv('FEED_CACHE_INDEX_TIMEOUT', 300)),
+    'group_list': int(os.getenv('FEED_CACHE_GROUP_TIMEOUT', 600)),
+    'profile': int(os.getenv('FEED_CACHE_PROFILE_TIMEOUT', 600)),
+    'follow': int(os.getenv('FEED_CACHE_FOLLOW_TIMEOUT', 120)),
+}
+# Карточки постов сбрасываются сигналами, поэтому живут долго.
+POST_CARD_CACHE_TIMEOUT = int(os.getenv('POST_CARD_CACHE_TIMEOUT', 86400))
+
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl). Их готовит
+# фоновая команда thumbnail_worker, а не запрос страницы.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_BACKEND = 'posts.thumbnails.PostThumbnailBackend'
+# Ширины адаптивных копий картинки для srcset и пропорции карточки.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_ASPECT = (960, 339)
+
+# Подписчиков у автора, после которого его посты не раскладываются
+# по лентам при публикации, а подмешиваются при чтении (0 - всегда).
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 1000))
+# Раскладка возвращается автору (команда resume_fan_out), когда
+# подписчиков не больше этого числа: запас ниже лимита не даёт
+# подписке и отписке на границе пересобирать ленты.
+TIMELINE_FANOUT_RESUME = int(os.getenv(
+    'TIMELINE_FANOUT_RESUME', TIMELINE_FANOUT_LIMIT * 9 // 10))
+
+# Заголовок Server-Timing с временем SQL, шаблонов и миниатюр. Запросы
+# дольше SERVER_TIMING_LOG_MS миллисекунд ещё и пишутся в лог JSON.
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+SERVER_TIMING_LOG_MS = (
+    int(os.getenv('SERVER_TIMING_LOG_MS'))
+    if os.getenv('SERVER_TIMING_LOG_MS') else None
+)
+
+# Записанные числа SQL-запросов представлений (см. core.query_budget).
+QUERY_BUDGET_BASELINE = os.path.join(
+    BASE_DIR, 'posts', 'tests', 'query_budget.json')